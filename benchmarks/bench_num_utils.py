@@ -0,0 +1,56 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+from synth import NUMERAL_STYLES, format_numeral
+
+DEFAULT_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def make_samples(volumes, per_volume, seed=0):
+    rnd = random.Random(seed)
+    samples = []
+    for _ in range(volumes):
+        style = rnd.choice(NUMERAL_STYLES)
+        samples.extend(format_numeral(n, style) for n in range(1, per_volume + 1))
+    return samples
+
+
+def bench(func, samples, rounds, clear_cache):
+    cache_clear = getattr(func, "cache_clear", None)
+    best = None
+    for _ in range(rounds):
+        if clear_cache and cache_clear:
+            cache_clear()
+        start = time.perf_counter()
+        for s in samples:
+            func(s)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(samples) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cn2an_simple 吞吐量基准")
+    parser.add_argument("--src", default=DEFAULT_SRC, help="插件源码目录（可指向旧版本检出以对比）")
+    parser.add_argument("--volumes", type=int, default=20)
+    parser.add_argument("--per-volume", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.src))
+    from num_utils import cn2an_simple
+
+    samples = make_samples(args.volumes, args.per_volume)
+    unique = sorted(set(samples))
+
+    print(f"样本: {len(samples)} 个（去重 {len(unique)} 个）, 源码: {os.path.abspath(args.src)}")
+    print(f"   全新输入 (无缓存命中): {bench(cn2an_simple, unique, args.rounds, True):,.0f} 个/秒")
+    print(f"   跨卷重复 (冷缓存):     {bench(cn2an_simple, samples, args.rounds, True):,.0f} 个/秒")
+    print(f"   跨书重复 (热缓存):     {bench(cn2an_simple, samples, args.rounds, False):,.0f} 个/秒")
+
+
+if __name__ == "__main__":
+    main()
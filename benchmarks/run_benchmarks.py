@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from synth import NUMERAL_STYLES, FakeBook, make_entries, make_nav, make_ncx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SRC = os.path.join(BENCH_DIR, "..", "src")
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def best_of(repeat, setup, func):
+    best = None
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def build_cases(args, size):
+    from config import DEFAULT_CONFIG, DEFAULT_VOL_REGEX
+    from intervals import count_intervals
+    from num_utils import cn2an_simple
+    from report import perform_check
+    from toc import (
+        extract_texts_from_xml,
+        insert_missing_chapters_to_nav,
+        remove_missing_placeholders,
+    )
+
+    volumes = max(1, size // args.chapters_per_volume)
+    entries = make_entries(
+        size,
+        volumes=volumes,
+        style=args.style,
+        gap_density=args.gap_density,
+        duplicates=int(size * args.duplicate_ratio),
+        reorders=int(size * args.reorder_ratio),
+        seed=args.seed,
+    )
+    nav = make_nav(entries)
+    ncx = make_ncx(entries)
+    numerals = [numeral for kind, _, numeral in entries if kind == "chapter"]
+
+    config = dict(DEFAULT_CONFIG)
+    if volumes > 1:
+        config.update(enable_volume=True, vol_regex=DEFAULT_VOL_REGEX)
+
+    # insert/remove are volume-unaware, so they get a flat book with the same gaps
+    flat_entries = make_entries(
+        size, style=args.style, gap_density=args.gap_density, seed=args.seed
+    )
+    flat_nav = make_nav(flat_entries)
+    flat_config = dict(DEFAULT_CONFIG)
+    flat_missing = perform_check(FakeBook(flat_nav), flat_config).missing
+    missing_count = count_intervals(flat_missing)
+    filled = FakeBook(flat_nav)
+    insert_missing_chapters_to_nav(filled, flat_config, flat_missing)
+    filled_nav = filled.readfile("toc")
+
+    def cold_numerals():
+        cn2an_simple.cache_clear()
+        return (numerals,)
+
+    def parse_all(items):
+        for item in items:
+            cn2an_simple(item)
+
+    return [
+        ("cn2an_simple", len(numerals), cold_numerals, parse_all),
+        (
+            "extract_texts_from_xml[nav]",
+            len(entries),
+            lambda: (nav,),
+            extract_texts_from_xml,
+        ),
+        (
+            "extract_texts_from_xml[ncx]",
+            len(entries),
+            lambda: (ncx,),
+            extract_texts_from_xml,
+        ),
+        (
+            "perform_check[nav]",
+            len(entries),
+            lambda: (FakeBook(nav), config),
+            perform_check,
+        ),
+        (
+            "perform_check[ncx]",
+            len(entries),
+            lambda: (FakeBook(ncx, "ncx"), config),
+            perform_check,
+        ),
+        (
+            "insert_missing_chapters_to_nav",
+            missing_count,
+            lambda: (FakeBook(flat_nav), flat_config, flat_missing),
+            insert_missing_chapters_to_nav,
+        ),
+        (
+            "remove_missing_placeholders",
+            missing_count,
+            lambda: (FakeBook(filled_nav),),
+            remove_missing_placeholders,
+        ),
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {(r["name"], r["size"]): r["seconds"] for r in data["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CheckMissingChapters 性能基准")
+    parser.add_argument(
+        "--src", default=DEFAULT_SRC, help="插件源码目录（可指向旧版本检出以对比）"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="目录条目规模"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取最优）")
+    parser.add_argument("--only", nargs="+", help="只运行名称包含这些关键字的基准")
+    parser.add_argument(
+        "--style",
+        default="mixed",
+        choices=("mixed",) + NUMERAL_STYLES,
+        help="数字风格（mixed 为每卷随机）",
+    )
+    parser.add_argument("--chapters-per-volume", type=int, default=500)
+    parser.add_argument("--gap-density", type=float, default=0.02, help="缺失章节比例")
+    parser.add_argument(
+        "--duplicate-ratio", type=float, default=0.002, help="重复章节比例"
+    )
+    parser.add_argument("--reorder-ratio", type=float, default=0.002, help="相邻乱序比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "-o", "--output", help="结果 JSON 路径（默认 benchmarks/results/ 下按时间命名）"
+    )
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.src))
+
+    baseline = load_baseline(args.compare) if args.compare else {}
+    results = []
+
+    for size in args.sizes:
+        for name, items, setup, func in build_cases(args, size):
+            if args.only and not any(key in name for key in args.only):
+                continue
+            seconds = best_of(args.repeat, setup, func)
+            results.append(
+                {"name": name, "size": size, "items": items, "seconds": seconds}
+            )
+
+            line = f"{name:<34} {size:>7}  {seconds * 1000:>10.2f} ms"
+            if items:
+                line += f"  {seconds / items * 1e6:>8.2f} µs/条"
+            previous = baseline.get((name, size))
+            if previous:
+                line += f"  ({previous / seconds:.2f}x)"
+            print(line, flush=True)
+
+    output = args.output
+    if not output:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        filename = time.strftime("bench-%Y%m%d-%H%M%S.json")
+        output = os.path.join(DEFAULT_RESULTS_DIR, filename)
+
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, ensure_ascii=False)
+    print(f"结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
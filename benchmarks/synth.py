@@ -0,0 +1,167 @@
+import random
+
+CN_DIGIT_CHARS = "零一二三四五六七八九"
+CN_UPPER_DIGIT_CHARS = "零壹贰叁肆伍陆柒捌玖"
+CN_UNIT_CHARS = ["", "十", "百", "千"]
+CN_UPPER_UNIT_CHARS = ["", "拾", "佰", "仟"]
+FULLWIDTH_MAP = str.maketrans("0123456789", "０１２３４５６７８９")
+
+NUMERAL_STYLES = ("arabic", "fullwidth", "cn_lower", "cn_upper")
+
+NAV_HEAD = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+    "<head><title>目录</title></head>\n<body>\n"
+    '<nav epub:type="toc" id="toc"><h1>目录</h1>\n<ol>\n'
+)
+NAV_TAIL = "</ol>\n</nav>\n</body>\n</html>\n"
+
+NCX_HEAD = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+    "<head></head>\n<docTitle><text>目录</text></docTitle>\n<navMap>\n"
+)
+NCX_TAIL = "</navMap>\n</ncx>\n"
+
+
+def to_cn_section(n, digits, units):
+    out = []
+    zero = False
+    for pos in range(3, -1, -1):
+        d = n // (10**pos) % 10
+        if d == 0:
+            zero = bool(out)
+            continue
+        if zero:
+            out.append(digits[0])
+            zero = False
+        if not (pos == 1 and d == 1 and not out):
+            out.append(digits[d])
+        out.append(units[pos])
+    return "".join(out)
+
+
+def to_cn(n, upper=False):
+    digits = CN_UPPER_DIGIT_CHARS if upper else CN_DIGIT_CHARS
+    units = CN_UPPER_UNIT_CHARS if upper else CN_UNIT_CHARS
+    if n == 0:
+        return digits[0]
+    high, low = divmod(n, 10000)
+    if not high:
+        return to_cn_section(low, digits, units)
+    text = to_cn_section(high, digits, units) + ("萬" if upper else "万")
+    if low:
+        if low < 1000:
+            text += digits[0]
+        text += to_cn_section(low, digits, units)
+    return text
+
+
+def format_numeral(n, style):
+    if style == "arabic":
+        return str(n)
+    if style == "fullwidth":
+        return str(n).translate(FULLWIDTH_MAP)
+    return to_cn(n, upper=style == "cn_upper")
+
+
+def make_entries(
+    chapters,
+    volumes=1,
+    style="mixed",
+    gap_density=0.0,
+    duplicates=0,
+    reorders=0,
+    seed=0,
+):
+    # (kind, number, numeral) in TOC order; kind is "volume" or "chapter".
+    # Chapters restart at 1 in every volume; "mixed" picks a style per volume.
+    rnd = random.Random(seed)
+    per_volume = max(1, chapters // max(volumes, 1))
+    entries = []
+
+    for vol in range(1, max(volumes, 1) + 1):
+        vol_style = rnd.choice(NUMERAL_STYLES) if style == "mixed" else style
+        if volumes > 1:
+            entries.append(("volume", vol, format_numeral(vol, "cn_lower")))
+        for n in range(1, per_volume + 1):
+            if gap_density and rnd.random() < gap_density:
+                continue
+            entries.append(("chapter", n, format_numeral(n, vol_style)))
+
+    chapter_positions = [i for i, e in enumerate(entries) if e[0] == "chapter"]
+
+    for _ in range(reorders):
+        i = rnd.choice(chapter_positions[:-1])
+        j = i + 1
+        if entries[j][0] == "chapter":
+            entries[i], entries[j] = entries[j], entries[i]
+
+    duplicate_count = min(duplicates, len(chapter_positions))
+    for i in sorted(rnd.sample(chapter_positions, duplicate_count), reverse=True):
+        entries.insert(i + 1, entries[i])
+
+    return entries
+
+
+def make_nav(entries):
+    parts = [NAV_HEAD]
+    in_volume = False
+    for i, (kind, n, numeral) in enumerate(entries):
+        if kind == "volume":
+            if in_volume:
+                parts.append("</ol></li>\n")
+            parts.append(f'<li><a href="Text/vol{n}.xhtml">第{numeral}卷</a><ol>\n')
+            in_volume = True
+        else:
+            parts.append(
+                f'<li><a href="Text/ch{i:06d}.xhtml">第{numeral}章 标题{n}</a></li>\n'
+            )
+    if in_volume:
+        parts.append("</ol></li>\n")
+    parts.append(NAV_TAIL)
+    return "".join(parts)
+
+
+def make_ncx(entries):
+    parts = [NCX_HEAD]
+    in_volume = False
+    for i, (kind, n, numeral) in enumerate(entries):
+        play_order = i + 1
+        if kind == "volume":
+            if in_volume:
+                parts.append("</navPoint>\n")
+            parts.append(
+                f'<navPoint id="np{i}" playOrder="{play_order}">'
+                f"<navLabel><text>第{numeral}卷</text></navLabel>"
+                f'<content src="Text/vol{n}.xhtml"/>\n'
+            )
+            in_volume = True
+        else:
+            parts.append(
+                f'<navPoint id="np{i}" playOrder="{play_order}">'
+                f"<navLabel><text>第{numeral}章 标题{n}</text></navLabel>"
+                f'<content src="Text/ch{i:06d}.xhtml"/></navPoint>\n'
+            )
+    if in_volume:
+        parts.append("</navPoint>\n")
+    parts.append(NCX_TAIL)
+    return "".join(parts)
+
+
+class FakeBook:
+    def __init__(self, content, toc_type="nav"):
+        if toc_type == "nav":
+            self.href, self.mime = "Text/nav.xhtml", "application/xhtml+xml"
+        else:
+            self.href, self.mime = "toc.ncx", "application/x-dtbncx+xml"
+        self.files = {"toc": content}
+
+    def manifest_iter(self):
+        yield "toc", self.href, self.mime
+
+    def readfile(self, manifest_id):
+        return self.files[manifest_id]
+
+    def writefile(self, manifest_id, content):
+        self.files[manifest_id] = content
@@ -0,0 +1,579 @@
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor
+from concurrent.futures import wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+
+from config import CONFIG_FILE, load_config
+from edition_diff import diff_editions, has_changes, pair_editions, render_diff
+from epub_book import EpubBook
+from intervals import format_intervals
+from library_index import LibraryIndex, file_stat, format_series_gap
+from matchers import get_chapter_matcher, get_vol_matcher
+from perf import PerfRecorder
+from report import perform_check
+from result_cache import config_fields_json, config_fingerprint
+from result_writers import RESULT_WRITERS
+from toc import load_toc
+from watch import FolderPoller, WatchStats
+
+_worker_config = None
+_worker_perf = False
+_worker_keep_result = False
+_worker_meta = False
+
+
+def find_epubs(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".epub"):
+                    yield os.path.join(root, name)
+
+
+def init_worker(config, collect_perf=False, keep_result=False, collect_meta=False):
+    global _worker_config, _worker_perf, _worker_keep_result, _worker_meta
+    _worker_config = config
+    _worker_perf = collect_perf
+    _worker_keep_result = keep_result
+    _worker_meta = collect_meta
+    # Warm the per-process matcher cache before the first book
+    get_chapter_matcher(config, config.get("multi_suffix", False))
+    if config.get("vol_regex"):
+        get_vol_matcher(config["vol_regex"])
+
+
+def init_watch_worker(*args):
+    # Ctrl-C is handled by the watching process, which shuts the pool down;
+    # workers are started lazily and must not inherit its SIGTERM handler
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    init_worker(*args)
+
+
+def stop_watch(signum, frame):
+    raise KeyboardInterrupt
+
+
+def check_book(path):
+    perf = PerfRecorder() if _worker_perf else None
+    meta = None
+    try:
+        with EpubBook(path) as bk:
+            doc = load_toc(bk, perf)
+            result = perform_check(bk, _worker_config, doc, perf=perf)
+            if _worker_meta:
+                meta = {
+                    "toc_hash": doc.content_hash() if doc else None,
+                    "series": bk.series,
+                    "series_index": bk.series_index,
+                }
+    except Exception as e:
+        return path, "ERROR", str(e), None, None, None
+    finally:
+        # load_toc may fail after its first stage started tracemalloc
+        if perf:
+            perf.finish()
+
+    perf_data = perf.to_dict() if perf else None
+    # The structured result is only shipped back when the output needs it
+    kept = result if _worker_keep_result else None
+    if result.error:
+        return path, "ERROR", result.error, kept, perf_data, meta
+    if not result.missing:
+        return path, "OK", "", kept, perf_data, meta
+    detail = f"{result.missing_count}: " + format_intervals(result.missing)
+    return path, "MISSING", detail, kept, perf_data, meta
+
+
+def diff_pair(pair):
+    old_path, new_path = pair
+    try:
+        diff, err = diff_editions(old_path, new_path, _worker_config)
+    except Exception as e:
+        diff, err = None, str(e)
+    return old_path, new_path, diff, err
+
+
+def build_config(args):
+    config = load_config(args.config)
+    overrides = {
+        "chap_prefix": args.prefix,
+        "chap_suffix": args.suffix,
+        "chap_num_type": args.num_type,
+        "chap_reset_mode": args.mode,
+        "vol_regex": args.vol_regex,
+        "max_gap": args.max_gap,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            config[key] = value
+    if args.volume:
+        config["enable_volume"] = True
+    if args.auto_reset:
+        config["auto_detect_reset"] = True
+    if args.suffixes:
+        config["custom_suffixes"] = args.suffixes.split("|")
+    if args.multi_suffix or args.suffixes:
+        config["multi_suffix"] = True
+    if args.spine:
+        config["check_spine"] = True
+    if args.title_dupes:
+        config["check_title_dupes"] = True
+    return config
+
+
+def cmd_check(args):
+    config = build_config(args)
+    books = list(find_epubs(args.paths))
+
+    index = None
+    stats = {}
+    skipped = 0
+    config_hash = config_fingerprint(config)
+    if args.index:
+        index = LibraryIndex(args.index)
+        index.add_config(config_hash, config_fields_json(config))
+        for path in books:
+            try:
+                stats[path] = file_stat(path)
+            except OSError:
+                pass
+        if args.changed_only:
+            # Unchanged files already checked with the same settings are skipped
+            known = index.known_stats(config_hash)
+            total = len(books)
+            books = [
+                path
+                for path in books
+                if known.get(os.path.abspath(path)) != stats.get(path)
+            ]
+            skipped = total - len(books)
+
+    out = (
+        open(args.output, "w", encoding="utf-8", newline="")
+        if args.output
+        else sys.stdout
+    )
+    writer = RESULT_WRITERS[args.format](out)
+    perf_out = open(args.perf_json, "w", encoding="utf-8") if args.perf_json else None
+
+    counts = {"OK": 0, "MISSING": 0, "ERROR": 0}
+    try:
+        with multiprocessing.Pool(
+            processes=args.jobs,
+            initializer=init_worker,
+            initargs=(
+                config,
+                perf_out is not None,
+                args.format != "tsv" or index is not None,
+                index is not None,
+            ),
+        ) as pool:
+            for path, status, detail, result, perf_data, meta in pool.imap_unordered(
+                check_book, books, chunksize=args.chunksize
+            ):
+                counts[status] += 1
+                writer.write(path, status, detail, result)
+                if index is not None:
+                    index.record(
+                        path, status, detail, result, meta, stats.get(path), config_hash
+                    )
+                if perf_out and perf_data:
+                    record = {"path": path, **perf_data}
+                    perf_out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if perf_out:
+            perf_out.close()
+        if index is not None:
+            index.close()
+
+    print(
+        f"共 {len(books)} 本: 完整 {counts['OK']}, "
+        f"缺失 {counts['MISSING']}, 出错 {counts['ERROR']}"
+        + (f", 未变化跳过 {skipped}" if args.changed_only else ""),
+        file=sys.stderr,
+    )
+    return 1 if counts["ERROR"] else 0
+
+
+def cmd_watch(args):
+    config = build_config(args)
+    config_hash = config_fingerprint(config)
+    index = None
+    known = None
+    if args.index:
+        index = LibraryIndex(args.index)
+        index.add_config(config_hash, config_fields_json(config))
+        # Books already checked with the same settings are not checked again
+        known = index.known_stats(config_hash)
+
+    poller = FolderPoller(
+        args.paths, find_epubs, file_stat, known, settle=not args.once
+    )
+    stats = WatchStats()
+    out = (
+        open(args.output, "a", encoding="utf-8", newline="")
+        if args.output
+        else sys.stdout
+    )
+    writer = RESULT_WRITERS[args.format](out)
+    initargs = (
+        config,
+        False,
+        args.format != "tsv" or index is not None,
+        index is not None,
+    )
+    jobs = args.jobs or os.cpu_count()
+    # Only a few books per worker are handed out at a time; the rest wait
+    # here, so a stop never has to finish a long queue
+    limit = jobs * 2
+    waiting = {}
+    pending = {}
+    retried = set()
+
+    def start_pool():
+        # The pool lives as long as the watch, so workers keep their compiled
+        # matchers between books
+        return ProcessPoolExecutor(
+            max_workers=jobs, initializer=init_watch_worker, initargs=initargs
+        )
+
+    def restart_pool(pool):
+        pool.shutdown(wait=False, cancel_futures=True)
+        return start_pool()
+
+    def submit():
+        while waiting and len(pending) < limit:
+            key = next(iter(waiting))
+            path, stat = waiting[key]
+            try:
+                job = pool.submit(check_book, path)
+            except BrokenProcessPool:
+                return True
+            del waiting[key]
+            pending[key] = (job, path, stat)
+            stats.submitted += 1
+        return False
+
+    def collect():
+        broken = False
+        for key, (job, path, stat) in list(pending.items()):
+            if not job.done():
+                continue
+            del pending[key]
+            if job.cancelled():
+                continue
+            try:
+                path, status, detail, result, _, meta = job.result()
+            except BrokenProcessPool as e:
+                # A worker died on this book, or the pool went down with it;
+                # every book in flight gets one more try on a fresh pool
+                broken = True
+                if key not in retried:
+                    retried.add(key)
+                    waiting[key] = (path, stat)
+                    continue
+                status, detail, result, meta = "ERROR", str(e), None, None
+            retried.discard(key)
+            stats.completed(status)
+            writer.write(path, status, detail, result)
+            if index is not None:
+                index.record(path, status, detail, result, meta, stat, config_hash)
+        out.flush()
+        return broken
+
+    pool = start_pool()
+    signal.signal(signal.SIGTERM, stop_watch)
+    last_report = time.time()
+    try:
+        while True:
+            start = time.perf_counter()
+            ready, files = poller.poll(pending.keys() | waiting.keys())
+            stats.scanned(files, time.perf_counter() - start)
+            for path, stat in ready:
+                waiting[os.path.abspath(path)] = (path, stat)
+
+            deadline = time.time() + args.interval
+            while True:
+                # Not short-circuited: results are written even when a
+                # submit found the pool broken
+                if submit() | collect():
+                    pool = restart_pool(pool)
+                if args.once:
+                    if not waiting and not pending:
+                        break
+                    timeout = None
+                else:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                if pending:
+                    wait_futures(
+                        [job for job, _, _ in pending.values()],
+                        timeout,
+                        FIRST_COMPLETED,
+                    )
+                elif timeout:
+                    time.sleep(timeout)
+            depth = len(waiting) + len(pending)
+            if args.stats:
+                stats.write(args.stats, depth)
+            if args.once:
+                break
+            if args.report_every and time.time() - last_report >= args.report_every:
+                print(stats.format_line(depth), file=sys.stderr)
+                last_report = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Books already with the workers are finished and written out;
+        # waiting ones are picked up again on the next start
+        pool.shutdown(wait=True, cancel_futures=True)
+        collect()
+        if out is not sys.stdout:
+            out.close()
+        if index is not None:
+            index.close()
+
+    print(stats.format_line(len(waiting) + len(pending)), file=sys.stderr)
+    return 0
+
+
+def cmd_index(args):
+    if not os.path.exists(args.database):
+        print(f"索引文件不存在: {args.database}", file=sys.stderr)
+        return 1
+
+    with LibraryIndex(args.database) as index:
+        if args.query == "series":
+            for gap in index.iter_series_gaps():
+                print(format_series_gap(*gap))
+        elif args.query == "changed":
+            paths = list(find_epubs(args.paths)) if args.paths else None
+            for state, path in index.iter_changed(paths):
+                print(f"{state}\t{path}")
+        else:
+            summary = index.summary(args.top)
+            statuses = summary["statuses"]
+            total = sum(count for count, _ in statuses.values())
+            missing = sum(m for _, m in statuses.values())
+            print(
+                f"共 {total} 本: 完整 {statuses.get('OK', (0, 0))[0]}, "
+                f"缺失 {statuses.get('MISSING', (0, 0))[0]}, "
+                f"出错 {statuses.get('ERROR', (0, 0))[0]}"
+            )
+            print(f"缺失章节合计: {missing}")
+            print(f"系列: {summary['series']}")
+            if summary["worst"]:
+                print("缺失最多:")
+                for path, count in summary["worst"]:
+                    print(f"  {count}\t{path}")
+    return 0
+
+
+def cmd_diff(args):
+    config = build_config(args)
+    if os.path.isdir(args.old) and os.path.isdir(args.new):
+        pairs = list(pair_editions(args.old, args.new))
+    else:
+        pairs = [(args.old, args.new)]
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    counts = {"SAME": 0, "CHANGED": 0, "ERROR": 0}
+    try:
+        with multiprocessing.Pool(
+            processes=min(args.jobs, len(pairs)) or 1,
+            initializer=init_worker,
+            initargs=(config,),
+        ) as pool:
+            for old_path, new_path, diff, err in pool.imap(diff_pair, pairs):
+                if err:
+                    status = "ERROR"
+                elif has_changes(diff):
+                    status = "CHANGED"
+                else:
+                    status = "SAME"
+                counts[status] += 1
+
+                if args.format == "jsonl":
+                    record = {"old": old_path, "new": new_path, "status": status}
+                    if err:
+                        record["error"] = err
+                    else:
+                        record.update(diff)
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    continue
+                out.write(f"{old_path} -> {new_path}\n")
+                lines = [err] if err else render_diff(diff)
+                out.write("".join(f"  {line}\n" for line in lines))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(
+        f"共 {len(pairs)} 对: 一致 {counts['SAME']}, "
+        f"有变化 {counts['CHANGED']}, 出错 {counts['ERROR']}",
+        file=sys.stderr,
+    )
+    return 1 if counts["ERROR"] else 0
+
+
+def add_config_arguments(parser):
+    parser.add_argument(
+        "--config", default=CONFIG_FILE, help="配置文件路径（默认插件目录下的 config.json）"
+    )
+    parser.add_argument("--prefix", help="章节前缀，如: 第")
+    parser.add_argument("--suffix", help="章节后缀，如: 章 或 章|回")
+    parser.add_argument(
+        "--num-type", choices=["mixed", "arabic", "cn_lower", "cn_upper"], help="数字类型"
+    )
+    parser.add_argument(
+        "--mode", choices=["reset_1", "reset_0", "continuous"], help="编号模式"
+    )
+    parser.add_argument("--volume", action="store_true", help="启用卷/部检测")
+    parser.add_argument("--vol-regex", help="卷正则")
+    parser.add_argument(
+        "--max-gap",
+        type=int,
+        help="连续缺失超过此章数时按异常跳跃列出、不计入缺失（0 为不启用）",
+    )
+    parser.add_argument("--auto-reset", action="store_true", help="自动检测章节重置")
+    parser.add_argument(
+        "--multi-suffix", action="store_true", help="按后缀列表中的每个后缀分别检测"
+    )
+    parser.add_argument("--suffixes", help="多后缀检测的后缀列表，如: 章|话|番外")
+    parser.add_argument(
+        "--spine", action="store_true", help="同时扫描正文文件标题并与目录交叉核对"
+    )
+    parser.add_argument(
+        "--title-dupes", action="store_true", help="列出标题相同但章节号不同的章节"
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="CheckMissingChapters 命令行批量检查"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_check = sub.add_parser("check", help="批量检查 EPUB 文件或目录")
+    p_check.add_argument("paths", nargs="+", help="EPUB 文件或包含 EPUB 的目录")
+    p_check.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="工作进程数"
+    )
+    p_check.add_argument(
+        "--chunksize", type=int, default=8, help="每次分派给工作进程的书籍数"
+    )
+    p_check.add_argument("-o", "--output", help="结果输出文件（默认标准输出）")
+    p_check.add_argument(
+        "--format",
+        choices=sorted(RESULT_WRITERS),
+        default="tsv",
+        help="输出格式: tsv 每本一行; jsonl 每本一条完整结构化结果; csv 每个序列一行",
+    )
+    p_check.add_argument(
+        "--perf-json", help="将每本书的分阶段耗时/计数/峰值内存写入 JSON Lines 文件"
+    )
+    p_check.add_argument(
+        "--index", help="将每本书的结果写入 SQLite 书库索引（供 index 子命令查询）"
+    )
+    p_check.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="跳过索引中未变化且配置相同的书籍（需配合 --index）",
+    )
+    add_config_arguments(p_check)
+    p_check.set_defaults(func=cmd_check)
+
+    p_watch = sub.add_parser(
+        "watch", help="持续监视投放目录，新增或修改的 EPUB 自动检查"
+    )
+    p_watch.add_argument("paths", nargs="+", help="要监视的目录")
+    p_watch.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="工作进程数"
+    )
+    p_watch.add_argument(
+        "--interval", type=float, default=5.0, help="扫描目录的间隔秒数"
+    )
+    p_watch.add_argument("-o", "--output", help="结果追加写入的文件（默认标准输出）")
+    p_watch.add_argument(
+        "--format",
+        choices=sorted(RESULT_WRITERS),
+        default="jsonl",
+        help="输出格式，同 check",
+    )
+    p_watch.add_argument(
+        "--index", help="结果写入 SQLite 书库索引；重启后跳过已检查且未变化的书籍"
+    )
+    p_watch.add_argument(
+        "--stats", help="每轮扫描后将吞吐量、队列长度等计数写入此 JSON 文件"
+    )
+    p_watch.add_argument(
+        "--report-every",
+        type=float,
+        default=60.0,
+        help="每隔多少秒在标准错误输出一行统计（0 为不输出）",
+    )
+    p_watch.add_argument(
+        "--once", action="store_true", help="只扫描一次，检查完毕后退出"
+    )
+    add_config_arguments(p_watch)
+    p_watch.set_defaults(func=cmd_watch)
+
+    p_index = sub.add_parser("index", help="查询 check --index 生成的书库索引")
+    p_index.add_argument("database", help="SQLite 索引文件")
+    p_index.add_argument(
+        "query",
+        choices=["summary", "series", "changed"],
+        help="summary 汇总统计; series 系列相邻分册之间的章节断档/重叠; "
+        "changed 列出自上次检查后新增/修改/删除的书籍",
+    )
+    p_index.add_argument("paths", nargs="*", help="changed 查询时要比对的 EPUB 文件或目录")
+    p_index.add_argument("--top", type=int, default=10, help="summary 中列出缺失最多的书籍数")
+    p_index.set_defaults(func=cmd_index)
+
+    p_diff = sub.add_parser(
+        "diff", help="比较同一本书的两个版本，列出新增/删除/改标题/改编号的章节"
+    )
+    p_diff.add_argument(
+        "old", help="旧版 EPUB 或目录文件 (nav.xhtml/toc.ncx)；也可为目录，按相对路径配对"
+    )
+    p_diff.add_argument("new", help="新版 EPUB 或目录文件；也可为目录")
+    p_diff.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="工作进程数"
+    )
+    p_diff.add_argument("-o", "--output", help="结果输出文件（默认标准输出）")
+    p_diff.add_argument(
+        "--format",
+        choices=["text", "jsonl"],
+        default="text",
+        help="输出格式: text 可读文本; jsonl 每对一条完整结构化结果",
+    )
+    add_config_arguments(p_diff)
+    p_diff.set_defaults(func=cmd_diff)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "changed_only", False) and not args.index:
+        parser.error("--changed-only 需要同时指定 --index")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,10 @@ CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.j
 
 DEFAULT_VOL_REGEX = rf"第\s*({NUM_PATTERNS['mixed']})\s*[卷部册辑篇集幕]"
 
+# Gaps wider than this many chapters are reported as outliers rather than
+# missing; 0 turns the cutoff off
+DEFAULT_MAX_GAP = 0
+
 DEFAULT_CONFIG = {
     "chap_prefix": "第",
     "chap_num_type": "mixed",
@@ -18,20 +22,32 @@ DEFAULT_CONFIG = {
     "vol_regex": DEFAULT_VOL_REGEX,
     "chap_reset_mode": "reset_1",
     "auto_detect_reset": False,
+    "multi_suffix": False,
+    "check_spine": False,
+    "check_title_dupes": False,
+    "max_gap": DEFAULT_MAX_GAP,
+    "result_cache_size": 64,
+    "show_perf": False,
 }
 
 
-def load_or_create_config():
+def load_config(path=CONFIG_FILE):
     config = DEFAULT_CONFIG.copy()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            user_config = json.load(f)
+            for k, v in user_config.items():
+                config[k] = v
+    except Exception:
+        pass
+    return config
+
+
+def load_or_create_config():
     if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                user_config = json.load(f)
-                for k, v in user_config.items():
-                    config[k] = v
-        except Exception:
-            pass
+        config = load_config()
     else:
+        config = DEFAULT_CONFIG.copy()
         try:
             with open(CONFIG_FILE, "w", encoding="utf-8") as f:
                 json.dump(DEFAULT_CONFIG, f, indent=4, ensure_ascii=False)
@@ -62,3 +78,25 @@ def build_chapter_regex_str(config):
         real_suffix = re.escape(suffix)
 
     return f"{escaped_prefix}\\s*({num_pat})\\s*{real_suffix}"
+
+
+def split_suffixes(suffixes):
+    parts = []
+    for suffix in suffixes:
+        for p in suffix.split("|"):
+            p = p.strip()
+            if p and p not in parts:
+                parts.append(p)
+    return parts
+
+
+def build_multi_suffix_regex_str(config):
+    prefix = config["chap_prefix"]
+    num_type = config.get("chap_num_type", "mixed")
+    num_pat = NUM_PATTERNS.get(num_type, NUM_PATTERNS["mixed"])
+    suffixes = split_suffixes(config.get("custom_suffixes") or [config["chap_suffix"]])
+
+    # Longest first so that e.g. 番外 wins over 番
+    alternation = "|".join(re.escape(p) for p in sorted(suffixes, key=len, reverse=True))
+
+    return f"{re.escape(prefix)}\\s*(?P<num>{num_pat})\\s*(?P<suffix>{alternation})"
@@ -0,0 +1,211 @@
+import os
+from collections import deque
+
+from epub_book import EpubBook
+from matchers import (
+    RegexBudgetExceeded,
+    format_budget_error,
+    get_chapter_matcher,
+    get_vol_matcher,
+)
+from report import scan_toc_texts
+from toc import TocDocument, load_toc
+
+DIFF_PREVIEW = 50
+
+
+def load_edition(path):
+    # An EPUB, or a bare TOC snapshot (nav.xhtml / toc.ncx) kept from an
+    # earlier delivery
+    if path.lower().endswith(".epub"):
+        try:
+            with EpubBook(path) as bk:
+                doc = load_toc(bk)
+        except Exception as e:
+            return None, str(e)
+        if doc is None:
+            return None, "错误: 无法找到或解析目录文件 (nav.xhtml/toc.ncx)"
+        return doc, None
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+    except Exception as e:
+        return None, str(e)
+    if path.lower().endswith(".ncx") or "<ncx" in content[:2000]:
+        return TocDocument(path, "ncx", content), None
+    return TocDocument(path, "nav", content), None
+
+
+def collect_chapters(doc, config):
+    # [(volume, number, title, title_key)] in TOC order; placeholders skipped
+    try:
+        chap_re = get_chapter_matcher(config)
+    except Exception as e:
+        return None, f"正则错误: {e}"
+
+    enable_vol = config["enable_volume"]
+    vol_re = None
+    if enable_vol and config["vol_regex"]:
+        vol_re, vol_err = get_vol_matcher(config["vol_regex"])
+        if vol_err:
+            return None, vol_err
+
+    records = []
+    try:
+        scan_toc_texts(doc.iter_texts(), chap_re, vol_re, enable_vol, records=records)
+    except RegexBudgetExceeded:
+        return None, format_budget_error()
+    return records, None
+
+
+def match_chapters(old, new, old_done, new_done, key):
+    # Pairs unmatched chapters with equal keys, first come first served
+    index = {}
+    for j, item in enumerate(new):
+        if not new_done[j]:
+            k = key(item)
+            if k is not None:
+                index.setdefault(k, deque()).append(j)
+
+    pairs = []
+    for i, item in enumerate(old):
+        if old_done[i]:
+            continue
+        k = key(item)
+        queue = index.get(k) if k is not None else None
+        if queue:
+            j = queue.popleft()
+            old_done[i] = new_done[j] = True
+            pairs.append((i, j))
+    return pairs
+
+
+def diff_chapters(old, new):
+    old_done = [False] * len(old)
+    new_done = [False] * len(new)
+
+    # Same number and title first, then a title that moved to another number,
+    # then a number whose title changed; whatever is left was added or dropped
+    same = match_chapters(old, new, old_done, new_done, lambda x: (x[0], x[1], x[3]))
+    moved = match_chapters(old, new, old_done, new_done, lambda x: x[3] or None)
+    renamed = match_chapters(old, new, old_done, new_done, lambda x: (x[0], x[1]))
+
+    return {
+        "old_count": len(old),
+        "new_count": len(new),
+        "unchanged": len(same),
+        "added": [list(new[j][:3]) for j in range(len(new)) if not new_done[j]],
+        "removed": [list(old[i][:3]) for i in range(len(old)) if not old_done[i]],
+        "retitled": [
+            [old[i][0], old[i][1], old[i][2], new[j][2]] for i, j in renamed
+        ],
+        "renumbered": [
+            [old[i][0], old[i][1], new[j][0], new[j][1], new[j][2]] for i, j in moved
+        ],
+    }
+
+
+def diff_editions(old_path, new_path, config):
+    chapters = []
+    for path in (old_path, new_path):
+        doc, err = load_edition(path)
+        if err:
+            return None, f"{path}: {err}"
+        records, err = collect_chapters(doc, config)
+        if err:
+            return None, err
+        chapters.append(records)
+    return diff_chapters(*chapters), None
+
+
+def has_changes(diff):
+    return any(diff[key] for key in ("added", "removed", "retitled", "renumbered"))
+
+
+def format_chapter_ref(vol, num, end=None):
+    ref = f"第{num}章" if end is None else f"第{num}-{end}章"
+    return f"第{vol}卷 {ref}" if vol else ref
+
+
+def group_renumbered(items):
+    # Runs of consecutive chapters shifted by the same amount, as produced by
+    # one chapter inserted or dropped earlier in the book
+    runs = []
+    for old_vol, old_num, new_vol, new_num, title in items:
+        if runs:
+            run = runs[-1]
+            if (
+                run[0] == old_vol
+                and run[3] == new_vol
+                and run[2] + 1 == old_num
+                and run[5] + 1 == new_num
+            ):
+                run[2] = old_num
+                run[5] = new_num
+                run[6] += 1
+                continue
+        runs.append([old_vol, old_num, old_num, new_vol, new_num, new_num, 1, title])
+    return runs
+
+
+def format_renumbered_run(run):
+    old_vol, old_start, old_end, new_vol, new_start, new_end, count, title = run
+    if count == 1:
+        return (
+            f"「{title[:30]}」 {format_chapter_ref(old_vol, old_start)}"
+            f" -> {format_chapter_ref(new_vol, new_start)}"
+        )
+    old_ref = format_chapter_ref(old_vol, old_start, old_end)
+    new_ref = format_chapter_ref(new_vol, new_start, new_end)
+    return f"{old_ref} -> {new_ref} (共 {count} 章)"
+
+
+def render_diff(diff, limit=DIFF_PREVIEW):
+    lines = [
+        f"旧版 {diff['old_count']} 章，新版 {diff['new_count']} 章，"
+        f"未变化 {diff['unchanged']} 章"
+    ]
+    if not has_changes(diff):
+        lines.append("✅ 两个版本目录一致")
+        return lines
+
+    def section(label, items, formatter):
+        if not items:
+            return
+        lines.append(f"{label} ({len(items)})")
+        for item in items[:limit]:
+            lines.append("    " + formatter(item))
+        if len(items) > limit:
+            lines.append(f"    ... 另有 {len(items) - limit} 项")
+
+    section(
+        "➕ 新增",
+        diff["added"],
+        lambda x: f"{format_chapter_ref(x[0], x[1])} {x[2][:30]}".rstrip(),
+    )
+    section(
+        "➖ 删除",
+        diff["removed"],
+        lambda x: f"{format_chapter_ref(x[0], x[1])} {x[2][:30]}".rstrip(),
+    )
+    section(
+        "✏️ 改标题",
+        diff["retitled"],
+        lambda x: f"{format_chapter_ref(x[0], x[1])}: 「{x[2][:30]}」 -> 「{x[3][:30]}」",
+    )
+    section("🔢 改编号", group_renumbered(diff["renumbered"]), format_renumbered_run)
+    return lines
+
+
+def pair_editions(old_dir, new_dir):
+    # Books with the same relative path in both delivery folders
+    for root, dirs, files in os.walk(old_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(".epub"):
+                continue
+            old_path = os.path.join(root, name)
+            new_path = os.path.join(new_dir, os.path.relpath(old_path, old_dir))
+            if os.path.isfile(new_path):
+                yield old_path, new_path
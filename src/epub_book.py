@@ -0,0 +1,147 @@
+import codecs
+import mmap
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from urllib.parse import unquote
+
+TEXT_MIME_HINTS = ("xml", "html", "css", "text", "ncx")
+CONTAINER_PATH = "META-INF/container.xml"
+CHUNK_SIZE = 16 * 1024
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_series_index(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MappedFile:
+    def __init__(self, mm):
+        self.mm = mm
+
+    def seekable(self):
+        return True
+
+    def __getattr__(self, name):
+        return getattr(self.mm, name)
+
+
+class EpubBook:
+    def __init__(self, path):
+        self.path = path
+        self.zf = None
+        self.manifest = {}
+        self.spine = []
+        self.series = None
+        self.series_index = None
+        self.fp = open(path, "rb")
+        try:
+            self.mm = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self.mm = None
+        try:
+            source = MappedFile(self.mm) if self.mm is not None else self.fp
+            self.zf = zipfile.ZipFile(source)
+            self.opf_path = self.find_opf()
+            self.opf_dir = posixpath.dirname(self.opf_path)
+            self.parse_opf(self.zf.read(self.opf_path))
+        except Exception:
+            self.close()
+            raise
+
+    def find_opf(self):
+        try:
+            root = ET.fromstring(self.zf.read(CONTAINER_PATH))
+            for elem in root.iter():
+                if local_name(elem.tag) == "rootfile" and elem.get("full-path"):
+                    return elem.get("full-path")
+        except (KeyError, ET.ParseError):
+            pass
+
+        for name in self.zf.namelist():
+            if name.lower().endswith(".opf"):
+                return name
+        raise ValueError("EPUB 中未找到 OPF 文件")
+
+    def parse_opf(self, data):
+        root = ET.fromstring(data)
+        collections = {}
+        positions = {}
+        for elem in root.iter():
+            if local_name(elem.tag) == "meta":
+                name = elem.get("name")
+                prop = elem.get("property")
+                if name == "calibre:series":
+                    self.series = elem.get("content")
+                elif name == "calibre:series_index":
+                    self.series_index = parse_series_index(elem.get("content"))
+                elif prop == "belongs-to-collection" and elem.text:
+                    collections[elem.get("id")] = elem.text.strip()
+                elif prop == "group-position" and elem.get("refines"):
+                    positions[elem.get("refines").lstrip("#")] = elem.text
+            elif local_name(elem.tag) == "item":
+                manifest_id = elem.get("id")
+                href = elem.get("href")
+                if manifest_id and href:
+                    mime = elem.get("media-type", "")
+                    self.manifest[manifest_id] = (unquote(href), mime)
+            elif local_name(elem.tag) == "itemref":
+                idref = elem.get("idref")
+                if idref:
+                    self.spine.append((idref, elem.get("linear", "yes")))
+
+        # EPUB3 collections are only used when there is no calibre series
+        if self.series is None:
+            for collection_id, name in collections.items():
+                self.series = name
+                self.series_index = parse_series_index(positions.get(collection_id))
+                break
+
+    def manifest_iter(self):
+        for manifest_id, (href, mime) in self.manifest.items():
+            yield manifest_id, href, mime
+
+    def spine_iter(self):
+        for idref, linear in self.spine:
+            if idref in self.manifest:
+                yield idref, linear, self.manifest[idref][0]
+
+    def member_path(self, manifest_id):
+        href, _ = self.manifest[manifest_id]
+        return posixpath.normpath(posixpath.join(self.opf_dir, href))
+
+    def readfile(self, manifest_id):
+        mime = self.manifest[manifest_id][1]
+        data = self.zf.read(self.member_path(manifest_id))
+        if any(hint in mime for hint in TEXT_MIME_HINTS):
+            return data.decode("utf-8", errors="replace")
+        return data
+
+    def iter_chunks(self, manifest_id, size=CHUNK_SIZE):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        with self.zf.open(self.member_path(manifest_id)) as f:
+            while True:
+                data = f.read(size)
+                if not data:
+                    break
+                yield decoder.decode(data)
+        yield decoder.decode(b"", final=True)
+
+    def close(self):
+        if self.zf is not None:
+            self.zf.close()
+        if self.mm is not None:
+            self.mm.close()
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,154 @@
+from config import DEFAULT_VOL_REGEX, split_suffixes
+from matchers import (
+    RegexBudgetExceeded,
+    get_chapter_matcher,
+    get_vol_matcher,
+    guard_search,
+)
+from num_utils import CN_NUM_UPPER, cn2an_simple, normalize_number_text
+
+
+INFER_SAMPLE_SIZE = 400
+INFER_GOOD_COVERAGE = 0.95
+INFER_PREFIX_CANDIDATES = ["第", ""]
+INFER_VOL_WINDOW = 2000
+
+
+def sample_indices(total, size=INFER_SAMPLE_SIZE):
+    if total <= size:
+        return list(range(total))
+    # Evenly spaced, order preserved so that resets stay visible
+    step = total / size
+    return [int(i * step) for i in range(size)]
+
+
+def collect_matches(chap_re, texts, indices):
+    matches = []
+    search = chap_re.search
+    for i in indices:
+        m = search(texts[i])
+        if m:
+            matches.append((i, m.group(1)))
+    return matches
+
+
+def detect_num_type(num_strs):
+    counts = {"arabic": 0, "cn_lower": 0, "cn_upper": 0}
+    cn_upper_chars = set(CN_NUM_UPPER)
+    for s in num_strs:
+        s = normalize_number_text(s)
+        if s.isdigit():
+            counts["arabic"] += 1
+        elif any(c in cn_upper_chars for c in s):
+            counts["cn_upper"] += 1
+        else:
+            counts["cn_lower"] += 1
+
+    used = [k for k, v in counts.items() if v]
+    if len(used) == 1:
+        return used[0]
+    return "mixed"
+
+
+def find_resets(numbered):
+    return [
+        (a_idx, b_idx)
+        for (a_idx, a), (b_idx, b) in zip(numbered, numbered[1:])
+        if b < a
+    ]
+
+
+def detect_volumes(texts, vol_regex, windows):
+    vol_re, err = get_vol_matcher(vol_regex)
+    if err:
+        return False
+    vol_search = guard_search(vol_re.search)
+
+    # Volume headings are rare and easily missed by the sample, so only the
+    # head of the TOC and the stretches around chapter resets are scanned.
+    seen = set()
+    for start, end in windows:
+        for t in texts[start:end]:
+            try:
+                m = vol_search(t)
+            except RegexBudgetExceeded:
+                return False
+            if m:
+                seen.add(m.group(0))
+                if len(seen) >= 2:
+                    return True
+    return False
+
+
+def infer_config(texts, config):
+    texts = texts if isinstance(texts, list) else list(texts)
+    indices = sample_indices(len(texts))
+    if not indices:
+        return None, "目录为空，无法识别"
+
+    prefixes = list(INFER_PREFIX_CANDIDATES)
+    if config.get("chap_prefix") not in prefixes:
+        prefixes.insert(0, config.get("chap_prefix", ""))
+    suffixes = split_suffixes(config.get("custom_suffixes") or [config["chap_suffix"]])
+
+    best = None
+    done = False
+    for prefix in prefixes:
+        for suffix in suffixes:
+            candidate = {
+                "chap_prefix": prefix,
+                "chap_suffix": suffix,
+                "chap_num_type": "mixed",
+            }
+            chap_re = get_chapter_matcher(candidate)
+            matches = collect_matches(chap_re, texts, indices)
+            # A looser (empty) prefix only wins if it clearly covers more
+            if best is None or len(matches) > len(best[1]) * 1.1:
+                best = (candidate, matches)
+            if len(matches) >= len(indices) * INFER_GOOD_COVERAGE:
+                done = True
+                break
+        if done:
+            break
+
+    candidate, matches = best
+    if not matches:
+        return None, "未能识别章节格式，请手动设置"
+
+    candidate["chap_num_type"] = detect_num_type(s for _, s in matches)
+
+    numbered = []
+    for i, s in matches:
+        try:
+            numbered.append((i, cn2an_simple(s)))
+        except:
+            pass
+    resets = find_resets(numbered)
+
+    windows = [(0, INFER_VOL_WINDOW)] + [(a, b + 1) for a, b in resets]
+    vol_regex = config.get("vol_regex") or DEFAULT_VOL_REGEX
+    enable_vol = detect_volumes(texts, vol_regex, windows)
+    if not enable_vol and vol_regex != DEFAULT_VOL_REGEX:
+        vol_regex = DEFAULT_VOL_REGEX
+        enable_vol = detect_volumes(texts, vol_regex, windows)
+
+    if enable_vol and not resets:
+        mode = "continuous"
+    elif numbered and min(n for _, n in numbered) == 0:
+        mode = "reset_0"
+    else:
+        mode = "reset_1"
+
+    candidate.update(
+        enable_volume=enable_vol,
+        vol_regex=vol_regex,
+        chap_reset_mode=mode,
+        auto_detect_reset=bool(resets) and not enable_vol,
+    )
+
+    return {
+        "config": candidate,
+        "matched": len(matches),
+        "sampled": len(indices),
+        "total": len(texts),
+    }, None
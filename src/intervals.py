@@ -0,0 +1,49 @@
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def find_missing_intervals(unique_numbers):
+    intervals = []
+    for prev_num, curr_num in zip(unique_numbers, unique_numbers[1:]):
+        if curr_num - prev_num > 1:
+            intervals.append((prev_num + 1, curr_num - 1))
+    return intervals
+
+
+def split_gaps(gaps, max_gap=None):
+    # Gaps wider than max_gap are reported as outliers instead of missing chapters
+    missing = []
+    outliers = []
+    for gap_start, gap_end in gaps:
+        if max_gap and gap_end - gap_start + 1 > max_gap:
+            outliers.append((gap_start, gap_end))
+        else:
+            missing.append((gap_start, gap_end))
+    return missing, outliers
+
+
+def count_intervals(intervals):
+    return sum(end - start + 1 for start, end in intervals)
+
+
+def format_interval(start, end):
+    if start == end:
+        return str(start)
+    return f"{start}-{end}"
+
+
+def format_intervals(intervals):
+    return ", ".join(format_interval(start, end) for start, end in intervals)
+
+
+def iter_interval_numbers(intervals):
+    # Expanded one interval at a time; callers never see the full flat list
+    for start, end in merge_intervals(intervals):
+        yield from range(start, end + 1)
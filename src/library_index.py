@@ -0,0 +1,246 @@
+import os
+import re
+import sqlite3
+import time
+
+from intervals import format_interval
+from num_utils import cn2an_simple
+
+INDEX_SCHEMA_VERSION = 1
+INDEX_COMMIT_BATCH = 500
+SERIES_NAME_PATTERN = re.compile(
+    r"^(?P<name>.+?)[\s_\-.]*"
+    r"(?:第\s*(?P<cn>[零〇一二三四五六七八九十百]+)\s*[卷部册集]"
+    r"|(?:第\s*)?(?P<num>\d+)\s*[卷部册集]?)$"
+)
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    hash TEXT PRIMARY KEY,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS books (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime INTEGER,
+    toc_hash TEXT,
+    config_hash TEXT,
+    series TEXT,
+    series_index REAL,
+    status TEXT,
+    detail TEXT,
+    first_chapter INTEGER,
+    last_chapter INTEGER,
+    chapter_count INTEGER,
+    missing_count INTEGER,
+    checked_at REAL
+);
+CREATE INDEX IF NOT EXISTS books_series ON books (series, series_index);
+CREATE INDEX IF NOT EXISTS books_status ON books (status, missing_count);
+CREATE TABLE IF NOT EXISTS sequences (
+    path TEXT NOT NULL,
+    seq_no INTEGER NOT NULL,
+    name TEXT,
+    kind TEXT,
+    grp TEXT,
+    start_num INTEGER,
+    end_num INTEGER,
+    chapter_count INTEGER,
+    missing_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS sequences_path ON sequences (path);
+CREATE TABLE IF NOT EXISTS intervals (
+    path TEXT NOT NULL,
+    seq_no INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    start_num INTEGER,
+    end_num INTEGER
+);
+CREATE INDEX IF NOT EXISTS intervals_path ON intervals (path);
+"""
+
+
+def file_stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def guess_series(path):
+    # Fallback for books without series metadata: "书名 3.epub", "书名 第三卷.epub"
+    stem = os.path.splitext(os.path.basename(path))[0]
+    m = SERIES_NAME_PATTERN.match(stem)
+    if not m:
+        return None, None
+    name = m.group("name").strip(" _-.")
+    if not name:
+        return None, None
+    return name, float(cn2an_simple(m.group("cn") or m.group("num")))
+
+
+class LibraryIndex:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(INDEX_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version={INDEX_SCHEMA_VERSION}")
+        self.pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_config(self, config_hash, fields_json):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO configs (hash, fields) VALUES (?, ?)",
+            (config_hash, fields_json),
+        )
+
+    def known_stats(self, config_hash=None):
+        if config_hash is None:
+            rows = self.conn.execute("SELECT path, size, mtime FROM books")
+        else:
+            rows = self.conn.execute(
+                "SELECT path, size, mtime FROM books WHERE config_hash = ?",
+                (config_hash,),
+            )
+        return {path: (size, mtime) for path, size, mtime in rows}
+
+    def record(self, path, status, detail, result, meta, stat, config_hash):
+        path = os.path.abspath(path)
+        meta = meta or {}
+        series = meta.get("series")
+        series_index = meta.get("series_index")
+        if series is None:
+            series, series_index = guess_series(path)
+
+        sequences = []
+        if result is not None:
+            sequences = [seq for seq in result.sequences if seq.kind != "volumes"]
+        first = min((seq.start for seq in sequences), default=None)
+        last = max((seq.end for seq in sequences), default=None)
+
+        conn = self.conn
+        conn.execute("DELETE FROM sequences WHERE path = ?", (path,))
+        conn.execute("DELETE FROM intervals WHERE path = ?", (path,))
+        conn.execute(
+            "INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                stat[0] if stat else None,
+                stat[1] if stat else None,
+                meta.get("toc_hash"),
+                config_hash,
+                series,
+                series_index,
+                status,
+                detail,
+                first,
+                last,
+                sum(seq.count for seq in sequences),
+                result.missing_count if result is not None else None,
+                time.time(),
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO sequences VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    path,
+                    no,
+                    seq.name,
+                    seq.kind,
+                    seq.group,
+                    seq.start,
+                    seq.end,
+                    seq.count,
+                    seq.missing_count,
+                )
+                for no, seq in enumerate(sequences)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO intervals VALUES (?, ?, ?, ?, ?)",
+            [
+                (path, no, kind, start, end)
+                for no, seq in enumerate(sequences)
+                for kind, items in (("missing", seq.missing), ("outlier", seq.outliers))
+                for start, end in items
+            ],
+        )
+
+        self.pending += 1
+        if self.pending >= INDEX_COMMIT_BATCH:
+            conn.commit()
+            self.pending = 0
+
+    def iter_changed(self, paths=None):
+        # (state, path): NEW / CHANGED for the given files, REMOVED for
+        # indexed files that no longer exist when no paths are given
+        known = self.known_stats()
+        if paths is None:
+            for path, stat in known.items():
+                try:
+                    if file_stat(path) != stat:
+                        yield "CHANGED", path
+                except OSError:
+                    yield "REMOVED", path
+            return
+
+        for path in paths:
+            path = os.path.abspath(path)
+            stat = known.get(path)
+            if stat is None:
+                yield "NEW", path
+            elif file_stat(path) != stat:
+                yield "CHANGED", path
+
+    def iter_series_gaps(self):
+        # Consecutive books of one series should continue the chapter numbers;
+        # a book starting again at 0/1 is taken to number its own chapters.
+        rows = self.conn.execute(
+            "SELECT series, series_index, path, first_chapter, last_chapter FROM books "
+            "WHERE series IS NOT NULL AND series_index IS NOT NULL "
+            "AND first_chapter IS NOT NULL ORDER BY series, series_index, path"
+        )
+        prev = None
+        for series, _, path, first, last in rows:
+            if prev is not None and prev[0] == series and first > 1:
+                _, prev_path, prev_last = prev
+                if first > prev_last + 1:
+                    yield series, prev_path, path, "gap", (prev_last + 1, first - 1)
+                elif first <= prev_last:
+                    yield series, prev_path, path, "overlap", (first, min(last, prev_last))
+            prev = (series, path, last)
+
+    def summary(self, top=10):
+        conn = self.conn
+        statuses = {
+            status: (count, missing or 0)
+            for status, count, missing in conn.execute(
+                "SELECT status, COUNT(*), SUM(missing_count) FROM books GROUP BY status"
+            )
+        }
+        series_count = conn.execute(
+            "SELECT COUNT(DISTINCT series) FROM books WHERE series IS NOT NULL"
+        ).fetchone()[0]
+        worst = conn.execute(
+            "SELECT path, missing_count FROM books WHERE status = 'MISSING' "
+            "ORDER BY missing_count DESC LIMIT ?",
+            (top,),
+        ).fetchall()
+        return {"statuses": statuses, "series": series_count, "worst": worst}
+
+
+def format_series_gap(series, prev_path, path, kind, interval):
+    label = "缺失" if kind == "gap" else "重叠"
+    return "\t".join(
+        (series, prev_path, path, f"{label} {format_interval(*interval)}")
+    )
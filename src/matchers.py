@@ -0,0 +1,261 @@
+import re
+import string
+import time
+from functools import lru_cache
+
+from config import build_chapter_regex_str, build_multi_suffix_regex_str
+from num_utils import CN_NUM_ALL
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+
+MATCHER_CACHE_SIZE = 32
+# Total seconds the volume regex may spend on one TOC, and the longest text it
+# is run on; volume headings are short, so longer texts are cut.
+VOL_REGEX_BUDGET = 2.0
+VOL_TEXT_LIMIT = 200
+
+REPEAT_OPS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+CHAR_OPS = (
+    sre_constants.LITERAL,
+    sre_constants.NOT_LITERAL,
+    sre_constants.IN,
+    sre_constants.ANY,
+)
+CATEGORY_PATTERNS = {
+    sre_constants.CATEGORY_DIGIT: re.compile(r"\d"),
+    sre_constants.CATEGORY_NOT_DIGIT: re.compile(r"\D"),
+    sre_constants.CATEGORY_SPACE: re.compile(r"\s"),
+    sre_constants.CATEGORY_NOT_SPACE: re.compile(r"\S"),
+    sre_constants.CATEGORY_WORD: re.compile(r"\w"),
+    sre_constants.CATEGORY_NOT_WORD: re.compile(r"\W"),
+}
+PROBE_CHARS = string.printable + "　０９第卷部册章节回话集" + CN_NUM_ALL
+
+
+class RegexBudgetExceeded(Exception):
+    pass
+
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def compile_chapter_matcher(prefix, num_type, suffix, suffixes=None):
+    fields = {"chap_prefix": prefix, "chap_num_type": num_type, "chap_suffix": suffix}
+    if suffixes is not None:
+        fields["custom_suffixes"] = list(suffixes)
+        return re.compile(build_multi_suffix_regex_str(fields))
+    return re.compile(build_chapter_regex_str(fields))
+
+
+def get_chapter_matcher(config, multi_suffix=False):
+    suffixes = tuple(config.get("custom_suffixes") or ()) if multi_suffix else None
+    return compile_chapter_matcher(
+        config["chap_prefix"],
+        config.get("chap_num_type", "mixed"),
+        config["chap_suffix"],
+        suffixes,
+    )
+
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def get_vol_matcher(pattern):
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        return None, f"正则错误: {e}"
+    if has_backtracking_hazard(pattern):
+        return (
+            None,
+            "卷正则在重复中含有嵌套量词或开头相同的分支 (如 (a+)+、(a|aa)+)，"
+            "可能导致回溯失控，请改写后重试",
+        )
+    return regex, None
+
+
+def guard_search(search, budget=VOL_REGEX_BUDGET, limit=VOL_TEXT_LIMIT):
+    # re cannot be interrupted mid-search, so the budget is only checked
+    # between texts. has_backtracking_hazard rejects the usual exponential
+    # shapes up front, but a pattern it misses can still run long on one text.
+    remaining = budget
+    clock = time.perf_counter
+
+    def guarded(text):
+        nonlocal remaining
+        start = clock()
+        m = search(text[:limit] if len(text) > limit else text)
+        remaining -= clock() - start
+        if remaining < 0:
+            raise RegexBudgetExceeded(budget)
+        return m
+
+    return guarded
+
+
+def format_budget_error(budget=VOL_REGEX_BUDGET):
+    return f"卷正则执行超过 {budget:g} 秒，已中止检查，请简化卷正则"
+
+
+def iter_subpatterns(op, av):
+    if op == sre_constants.SUBPATTERN:
+        yield av[-1]
+    elif op in REPEAT_OPS or op == getattr(sre_constants, "POSSESSIVE_REPEAT", None):
+        yield av[2]
+    elif op == sre_constants.BRANCH:
+        yield from av[1]
+    elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        yield av[1]
+    elif op == getattr(sre_constants, "ATOMIC_GROUP", None):
+        yield av
+    elif op == sre_constants.GROUPREF_EXISTS:
+        yield av[1]
+        if av[2] is not None:
+            yield av[2]
+
+
+def class_item_matches(op, av, ch):
+    if op == sre_constants.LITERAL:
+        return ord(ch) == av
+    if op == sre_constants.RANGE:
+        return av[0] <= ord(ch) <= av[1]
+    if op == sre_constants.CATEGORY:
+        pattern = CATEGORY_PATTERNS.get(av)
+        return pattern is None or pattern.match(ch) is not None
+    return True
+
+
+def char_matches(op, av, ch):
+    if op == sre_constants.LITERAL:
+        return ord(ch) == av
+    if op == sre_constants.NOT_LITERAL:
+        return ord(ch) != av
+    if op == sre_constants.ANY:
+        return ch != "\n"
+    negate = bool(av) and av[0][0] == sre_constants.NEGATE
+    items = av[1:] if negate else av
+    return any(class_item_matches(item_op, item_av, ch) for item_op, item_av in items) != negate
+
+
+def pattern_chars(items, alphabet):
+    # Every probe character a (sub)pattern could consume
+    chars = set()
+    for op, av in items:
+        if op in CHAR_OPS:
+            chars.update(ch for ch in alphabet if char_matches(op, av, ch))
+        elif op == sre_constants.GROUPREF:
+            return set(alphabet)
+        else:
+            for sub in iter_subpatterns(op, av):
+                chars |= pattern_chars(sub, alphabet)
+    return chars
+
+
+def required_chars(items, alphabet):
+    # Character sets of the single characters every match of items must contain
+    required = []
+    for op, av in items:
+        if op in CHAR_OPS:
+            required.append({ch for ch in alphabet if char_matches(op, av, ch)})
+        elif op == sre_constants.SUBPATTERN:
+            required.extend(required_chars(av[-1], alphabet))
+    return required
+
+
+def iter_inner_repeats(items):
+    for op, av in items:
+        if op in REPEAT_OPS and av[1] > 1:
+            yield av[2]
+        for sub in iter_subpatterns(op, av):
+            yield from iter_inner_repeats(sub)
+
+
+def first_chars(items, alphabet):
+    # (chars, can_be_empty): probe characters a match of items can start with
+    chars = set()
+    for op, av in items:
+        if op in CHAR_OPS:
+            chars.update(ch for ch in alphabet if char_matches(op, av, ch))
+            return chars, False
+        if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            continue
+        if op == sre_constants.SUBPATTERN:
+            sub, empty = first_chars(av[-1], alphabet)
+        elif op in REPEAT_OPS or op == getattr(sre_constants, "POSSESSIVE_REPEAT", None):
+            sub, empty = first_chars(av[2], alphabet)
+            empty = empty or av[0] == 0
+        elif op == sre_constants.BRANCH:
+            sub, empty = set(), False
+            for alt in av[1]:
+                alt_chars, alt_empty = first_chars(alt, alphabet)
+                sub |= alt_chars
+                empty = empty or alt_empty
+        elif op == getattr(sre_constants, "ATOMIC_GROUP", None):
+            sub, empty = first_chars(av, alphabet)
+        else:
+            return set(alphabet), True
+        chars |= sub
+        if not empty:
+            return chars, False
+    return chars, True
+
+
+def iter_ambiguous(items, follow, alphabet):
+    # Sub-patterns that can split the same text more than one way: a variable
+    # repeat whose text could as well be left to what follows it, or a branch
+    # whose alternatives can start alike (re turns (a|aa) into a(?:|a)).
+    # follow holds the characters that may come after items.
+    for k, (op, av) in enumerate(items):
+        rest, rest_empty = first_chars(items[k + 1 :], alphabet)
+        after = rest | follow if rest_empty else rest
+        if op in REPEAT_OPS:
+            body_chars = first_chars(av[2], alphabet)[0]
+            if av[0] != av[1] and body_chars & after:
+                yield [(op, av)]
+            yield from iter_ambiguous(av[2], after | body_chars, alphabet)
+        elif op == sre_constants.BRANCH:
+            seen = set()
+            for alt in av[1]:
+                chars, empty = first_chars(alt, alphabet)
+                if empty:
+                    chars = chars | after
+                if chars & seen:
+                    yield [(op, av)]
+                    break
+                seen |= chars
+            for alt in av[1]:
+                yield from iter_ambiguous(alt, after, alphabet)
+        elif op == sre_constants.SUBPATTERN:
+            yield from iter_ambiguous(av[-1], after, alphabet)
+
+
+def find_nested_repeat(items, alphabet):
+    for op, av in items:
+        if op in REPEAT_OPS and av[1] > 1:
+            body = av[2]
+            required = required_chars(body, alphabet)
+            # A required character the ambiguous part cannot eat splits the
+            # iterations unambiguously, as in (?:\s*\d)* or (?:第\d?\d卷)+
+            pieces = list(iter_inner_repeats(body))
+            pieces.extend(
+                iter_ambiguous(body, first_chars(body, alphabet)[0], alphabet)
+            )
+            for piece in pieces:
+                piece_chars = pattern_chars(piece, alphabet)
+                if not any(chars.isdisjoint(piece_chars) for chars in required):
+                    return True
+        for sub in iter_subpatterns(op, av):
+            if find_nested_repeat(sub, alphabet):
+                return True
+    return False
+
+
+def has_backtracking_hazard(pattern):
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return False
+    alphabet = set(PROBE_CHARS) | {ch for ch in pattern if not ch.isascii()}
+    return find_nested_repeat(list(parsed), alphabet)
@@ -1,7 +1,7 @@
-import re
+from functools import lru_cache
 
-CN_NUM_LOWER = "零〇一二三四五六七八九十百千万两"
-CN_NUM_UPPER = "壹贰叁肆伍陆柒捌玖拾佰仟萬"
+CN_NUM_LOWER = "零〇一二三四五六七八九十百千万亿两"
+CN_NUM_UPPER = "壹贰叁肆伍陆柒捌玖拾佰仟萬億"
 CN_NUM_ALL = CN_NUM_LOWER + CN_NUM_UPPER
 DIGIT_PATTERN = r"[0-9０-９]"
 
@@ -22,48 +22,65 @@ NUM_TYPE_NAMES = {
 FULLWIDTH_DIGIT_MAP = str.maketrans("０１２３４５６７８９", "0123456789")
 
 
+CN_DIGITS = {
+    "零": 0,
+    "〇": 0,
+    "一": 1,
+    "壹": 1,
+    "二": 2,
+    "贰": 2,
+    "两": 2,
+    "三": 3,
+    "叁": 3,
+    "四": 4,
+    "肆": 4,
+    "五": 5,
+    "伍": 5,
+    "六": 6,
+    "陆": 6,
+    "七": 7,
+    "柒": 7,
+    "八": 8,
+    "捌": 8,
+    "九": 9,
+    "玖": 9,
+}
+CN_UNITS = {
+    "十": 10,
+    "拾": 10,
+    "百": 100,
+    "佰": 100,
+    "千": 1000,
+    "仟": 1000,
+}
+CN_SECTION_UNITS = {
+    "万": 10000,
+    "萬": 10000,
+    "亿": 100000000,
+    "億": 100000000,
+}
+
+CN2AN_CACHE_SIZE = 4096
+
+
 def normalize_number_text(text):
     if not text:
         return ""
-    text = text.translate(FULLWIDTH_DIGIT_MAP)
-    text = re.sub(r"\s+", "", text)
-    return text
+    return "".join(text.translate(FULLWIDTH_DIGIT_MAP).split())
 
 
 def cn2an_simple(text):
-    cn_nums = {
-        "零": 0,
-        "〇": 0,
-        "一": 1,
-        "壹": 1,
-        "二": 2,
-        "贰": 2,
-        "两": 2,
-        "三": 3,
-        "叁": 3,
-        "四": 4,
-        "肆": 4,
-        "五": 5,
-        "伍": 5,
-        "六": 6,
-        "陆": 6,
-        "七": 7,
-        "柒": 7,
-        "八": 8,
-        "捌": 8,
-        "九": 9,
-        "玖": 9,
-    }
-    cn_units = {
-        "十": 10,
-        "拾": 10,
-        "百": 100,
-        "佰": 100,
-        "千": 1000,
-        "仟": 1000,
-        "万": 10000,
-        "萬": 10000,
-    }
+    # An optional regex group that did not match hands in None; checked
+    # before the cache so it never has to hold it
+    if not text:
+        return 0
+    return cached_cn2an(text)
+
+
+@lru_cache(maxsize=CN2AN_CACHE_SIZE)
+def cached_cn2an(text):
+    if text.isascii() and text.isdigit():
+        return int(text)
 
     text = normalize_number_text(text)
     if not text:
@@ -72,39 +89,36 @@ def cn2an_simple(text):
     if text.isdigit():
         return int(text)
 
-    if len(text) == 1 and text in cn_nums:
-        return cn_nums[text]
+    if len(text) == 1 and text in CN_DIGITS:
+        return CN_DIGITS[text]
 
-    result = 0
+    yi_part = 0
     wan_part = 0
     current_section = 0
     current_num = 0
 
-    i = 0
-    while i < len(text):
-        char = text[i]
-
-        if char in cn_nums:
-            current_num = cn_nums[char]
-        elif char in cn_units:
-            unit = cn_units[char]
-
-            if unit == 10000:
-                current_section += current_num
+    for char in text:
+        if char in CN_DIGITS:
+            current_num = CN_DIGITS[char]
+        elif char in CN_UNITS:
+            unit = CN_UNITS[char]
+            if current_num == 0 and unit == 10 and current_section == 0:
+                current_num = 1
+            current_section += current_num * unit
+            current_num = 0
+        elif char in CN_SECTION_UNITS:
+            current_section += current_num
+            if CN_SECTION_UNITS[char] == 10000:
                 wan_part = (wan_part + current_section) * 10000
-                current_section = 0
-                current_num = 0
             else:
-                if (
-                    current_num == 0
-                    and unit == 10
-                    and current_section == 0
-                    and wan_part == 0
-                ):
-                    current_num = 1
-                current_section += current_num * unit
-                current_num = 0
-        i += 1
-
-    result = wan_part + current_section + current_num
-    return result
+                yi_part = (yi_part + wan_part + current_section) * 100000000
+                wan_part = 0
+            current_section = 0
+            current_num = 0
+
+    return yi_part + wan_part + current_section + current_num
+
+
+# Benchmarks and callers expect the public name to expose the cache controls
+cn2an_simple.cache_clear = cached_cn2an.cache_clear
+cn2an_simple.cache_info = cached_cn2an.cache_info
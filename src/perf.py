@@ -0,0 +1,133 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+STAGE_LABELS = {
+    "toc_source": "定位目录",
+    "read_toc": "读取目录",
+    "xml_parse": "XML 解析",
+    "regex": "正则匹配",
+    "numeral": "数字转换",
+    "scan": "目录扫描",
+    "sequence": "序列检查",
+    "format": "报告生成",
+    "spine": "正文扫描",
+}
+
+
+@contextmanager
+def null_stage(name, items=0):
+    yield None
+
+
+class StageStats:
+    __slots__ = ("seconds", "items", "calls", "peak_kb")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.items = 0
+        self.calls = 0
+        self.peak_kb = None
+
+    def to_dict(self):
+        data = {"seconds": round(self.seconds, 6), "items": self.items, "calls": self.calls}
+        if self.peak_kb is not None:
+            data["peak_kb"] = self.peak_kb
+        return data
+
+
+class PerfRecorder:
+    def __init__(self, track_memory=True):
+        self.track_memory = track_memory
+        self.stages = {}
+        self.started_tracing = False
+        self.total_start = time.perf_counter()
+
+    def get(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    @contextmanager
+    def stage(self, name, items=0):
+        stats = self.get(name)
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            base = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            stats.items += items
+            if self.track_memory:
+                peak_kb = max(0, tracemalloc.get_traced_memory()[1] - base) // 1024
+                stats.peak_kb = max(stats.peak_kb or 0, peak_kb)
+
+    def timed_call(self, name, func):
+        stats = self.get(name)
+        clock = time.perf_counter
+
+        def wrapper(*args):
+            start = clock()
+            try:
+                return func(*args)
+            finally:
+                stats.seconds += clock() - start
+                stats.calls += 1
+
+        return wrapper
+
+    def timed_iter(self, name, iterable):
+        stats = self.get(name)
+        clock = time.perf_counter
+        it = iter(iterable)
+        while True:
+            start = clock()
+            try:
+                item = next(it)
+            except StopIteration:
+                stats.seconds += clock() - start
+                return
+            stats.seconds += clock() - start
+            stats.items += 1
+            yield item
+
+    def finish(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def total_seconds(self):
+        return time.perf_counter() - self.total_start
+
+    def to_dict(self):
+        return {
+            "total_seconds": round(self.total_seconds(), 6),
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+        }
+
+
+def format_perf_lines(data):
+    lines = ["=" * 50, "⏱️ 性能", "=" * 50]
+    for name, stats in data["stages"].items():
+        label = STAGE_LABELS.get(name, name)
+        line = f"   {label}: {stats['seconds'] * 1000:.1f} ms"
+        details = []
+        if stats["items"]:
+            details.append(f"{stats['items']} 项")
+        if stats["calls"] > 1:
+            details.append(f"{stats['calls']} 次")
+        if stats.get("peak_kb") is not None:
+            details.append(f"峰值内存 {stats['peak_kb']} KB")
+        if details:
+            line += f" ({', '.join(details)})"
+        lines.append(line)
+    lines.append(f"   总计: {data['total_seconds'] * 1000:.1f} ms")
+    return lines
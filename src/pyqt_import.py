@@ -11,6 +11,7 @@ try:
     from PyQt5.QtWidgets import *
     from PyQt5.QtCore import *
     from PyQt5.QtGui import *
+    from PyQt5.QtCore import pyqtSignal as Signal
 
     wrapper_loaded = True
     QT_VERSION = 5
@@ -0,0 +1,374 @@
+import bisect
+from collections import Counter
+
+from constants import MISSING_MARKER
+from intervals import find_missing_intervals, split_gaps
+from result import CheckResult, SequenceResult
+
+SAMPLE_COUNT = 5
+
+
+def get_expected_start(mode, prev_end=None):
+    if mode == "reset_1":
+        return 1
+    if mode == "reset_0":
+        return 0
+    if mode == "continuous" and prev_end is not None:
+        return prev_end + 1
+    return None
+
+
+def is_order_issue(prev_num, curr_num):
+    return curr_num - prev_num > 1 or curr_num < prev_num
+
+
+class SequenceState:
+    # Everything a sequence report is derived from, kept so that a single
+    # inserted or removed chapter only touches its neighbours:
+    # issues holds positions i where (order[i - 1], order[i]) is out of order.
+    __slots__ = (
+        "name",
+        "kind",
+        "group",
+        "order",
+        "counts",
+        "unique",
+        "gaps",
+        "issues",
+        "duplicates",
+        "reorder",
+    )
+
+    def __init__(self, seq, numbers):
+        self.name = seq.name
+        self.kind = seq.kind
+        self.group = seq.group
+        self.order = list(numbers)
+        self.counts = Counter(numbers)
+        self.unique = sorted(self.counts)
+        self.gaps = find_missing_intervals(self.unique)
+        self.issues = [
+            i
+            for i in range(1, len(numbers))
+            if is_order_issue(numbers[i - 1], numbers[i])
+        ]
+        self.duplicates = {num: n for num, n in self.counts.items() if n > 1}
+        self.reorder = False
+
+    def add_number(self, num):
+        self.counts[num] += 1
+        if self.counts[num] > 1:
+            if num not in self.duplicates:
+                self.reorder = True
+            self.duplicates[num] = self.counts[num]
+            return
+
+        unique = self.unique
+        gaps = self.gaps
+        i = bisect.bisect_left(unique, num)
+        unique.insert(i, num)
+        if len(unique) == 1:
+            return
+
+        if i == 0:
+            if unique[1] - num > 1:
+                gaps.insert(0, (num + 1, unique[1] - 1))
+        elif i == len(unique) - 1:
+            if num - unique[-2] > 1:
+                gaps.append((unique[-2] + 1, num - 1))
+        else:
+            # num sat inside exactly one gap; split it around num
+            j = bisect.bisect_right(gaps, (num + 1,)) - 1
+            gap_start, gap_end = gaps[j]
+            pieces = []
+            if gap_start < num:
+                pieces.append((gap_start, num - 1))
+            if num < gap_end:
+                pieces.append((num + 1, gap_end))
+            gaps[j : j + 1] = pieces
+
+    def drop_number(self, num):
+        self.counts[num] -= 1
+        if self.counts[num] > 1:
+            self.duplicates[num] = self.counts[num]
+            return
+        self.duplicates.pop(num, None)
+        if self.counts[num]:
+            return
+        del self.counts[num]
+
+        unique = self.unique
+        gaps = self.gaps
+        i = bisect.bisect_left(unique, num)
+        del unique[i]
+        if not unique:
+            return
+
+        if i == 0:
+            if gaps and gaps[0][0] == num + 1:
+                del gaps[0]
+        elif i == len(unique):
+            if gaps and gaps[-1][1] == num - 1:
+                gaps.pop()
+        else:
+            prev_num, next_num = unique[i - 1], unique[i]
+            j = bisect.bisect_left(gaps, (prev_num + 1,))
+            k = j
+            while k < len(gaps) and gaps[k][1] < next_num:
+                k += 1
+            gaps[j:k] = [(prev_num + 1, next_num - 1)]
+
+    def insert(self, pos, num):
+        order = self.order
+        issues = self.issues
+        order.insert(pos, num)
+
+        # The old pair ending at pos is split by num; later pairs shift by one
+        j = bisect.bisect_left(issues, pos)
+        if j < len(issues) and issues[j] == pos:
+            del issues[j]
+        for k in range(j, len(issues)):
+            issues[k] += 1
+        new = []
+        if pos > 0 and is_order_issue(order[pos - 1], num):
+            new.append(pos)
+        if pos + 1 < len(order) and is_order_issue(num, order[pos + 1]):
+            new.append(pos + 1)
+        issues[j:j] = new
+
+        self.add_number(num)
+
+    def remove(self, pos):
+        order = self.order
+        issues = self.issues
+        num = order.pop(pos)
+
+        j = bisect.bisect_left(issues, pos)
+        k = j
+        while k < len(issues) and issues[k] <= pos + 1:
+            k += 1
+        del issues[j:k]
+        for m in range(j, len(issues)):
+            issues[m] -= 1
+        if 0 < pos < len(order) and is_order_issue(order[pos - 1], order[pos]):
+            issues.insert(j, pos)
+
+        self.drop_number(num)
+        return num
+
+    def sort_duplicates(self):
+        # Duplicates are listed by first occurrence, as a full check does
+        pending = set(self.duplicates)
+        ordered = {}
+        for num in self.order:
+            if num in pending:
+                pending.discard(num)
+                ordered[num] = self.duplicates[num]
+                if not pending:
+                    break
+        self.duplicates = ordered
+        self.reorder = False
+
+    def to_sequence(self, mode, prev_end=None, max_gap=None):
+        order = self.order
+        if self.reorder:
+            self.sort_duplicates()
+        missing, outliers = split_gaps(self.gaps, max_gap)
+        return SequenceResult(
+            self.name,
+            self.unique[0],
+            self.unique[-1],
+            get_expected_start(mode, prev_end),
+            len(order),
+            missing,
+            outliers,
+            [(order[i - 1], order[i]) for i in self.issues],
+            list(self.duplicates.items()),
+            self.kind,
+            self.group,
+        )
+
+
+class CheckState:
+    # Chapter sequences of one check, laid end to end in TOC order, so that a
+    # TocEdit can be applied without reading the TOC again.
+    # auto_reset: the check splits at every descent, so an edit that creates
+    # or heals one changes the segments and needs a full check, even when
+    # this TOC came out as a single segment.
+    def __init__(
+        self, result, sequences, mode, max_gap=None, segmented=False, auto_reset=False
+    ):
+        self.result = result
+        self.sequences = sequences
+        self.mode = mode
+        self.max_gap = max_gap
+        self.segmented = segmented
+        self.auto_reset = auto_reset
+        self.starts = []
+        total = 0
+        for state in sequences:
+            self.starts.append(total)
+            total += len(state.order)
+        self.total = total
+        self.valid = True
+        # Texts of a prefix of the TOC chapters, so the samples in the
+        # analysis survive placeholders being added to and removed from it
+        self.head = list(result.analysis["sample_chapters"])
+
+    @classmethod
+    def from_check(
+        cls,
+        result,
+        pairs,
+        ordered,
+        mode,
+        max_gap=None,
+        segmented=False,
+        auto_reset=False,
+    ):
+        # Only usable when every sequence is one contiguous run of the TOC
+        flat = []
+        for _, numbers in pairs:
+            flat.extend(numbers)
+        if flat != ordered:
+            return None
+        sequences = [SequenceState(seq, numbers) for seq, numbers in pairs]
+        return cls(result, sequences, mode, max_gap, segmented, auto_reset)
+
+    def locate(self, pos):
+        idx = bisect.bisect_right(self.starts, pos) - 1
+        return idx, pos - self.starts[idx]
+
+    def shift(self, idx, amount):
+        for k in range(idx + 1, len(self.starts)):
+            self.starts[k] += amount
+        self.total += amount
+
+    def neighbour(self, idx, first):
+        if idx < 0 or idx >= len(self.sequences):
+            return None
+        order = self.sequences[idx].order
+        return order[0] if first else order[-1]
+
+    def insert(self, pos, num, side, anchor):
+        if side:
+            if pos >= self.total:
+                return False
+            idx, local = self.locate(pos)
+            state = self.sequences[idx]
+            if state.order[local] != anchor:
+                return False
+        else:
+            if pos <= 0:
+                return False
+            idx, local = self.locate(pos - 1)
+            local += 1
+            state = self.sequences[idx]
+            if state.order[local - 1] != anchor:
+                return False
+
+        if self.auto_reset:
+            # A placeholder must not create or heal a reset between segments
+            order = state.order
+            prev_num = order[local - 1] if local > 0 else None
+            next_num = order[local] if local < len(order) else None
+            if prev_num is not None and num < prev_num:
+                return False
+            if next_num is not None and next_num < num:
+                return False
+            if local == 0:
+                last = self.neighbour(idx - 1, False)
+                if last is not None and num >= last:
+                    return False
+            if local == len(order):
+                first = self.neighbour(idx + 1, True)
+                if first is not None and first >= num:
+                    return False
+
+        if pos < len(self.head) or len(self.head) == self.total:
+            prefix = self.result.settings["prefix"]
+            suffix = self.result.settings["suffix"]
+            self.head.insert(pos, f"{MISSING_MARKER}{prefix}{num}{suffix}"[:30])
+
+        state.insert(local, num)
+        self.shift(idx, 1)
+        return True
+
+    def remove(self, pos, num):
+        if pos >= self.total:
+            return False
+        idx, local = self.locate(pos)
+        state = self.sequences[idx]
+        order = state.order
+        if order[local] != num or len(order) == 1:
+            return False
+
+        if self.auto_reset:
+            if local == 0:
+                last = self.neighbour(idx - 1, False)
+                if last is not None and order[1] >= last:
+                    return False
+            if local == len(order) - 1:
+                first = self.neighbour(idx + 1, True)
+                if first is not None and first >= order[-2]:
+                    return False
+
+        if pos < len(self.head):
+            del self.head[pos]
+            if len(self.head) < SAMPLE_COUNT and len(self.head) < self.total - 1:
+                return False
+
+        state.remove(local)
+        self.shift(idx, -1)
+        return True
+
+    def apply(self, edit):
+        # Returns the updated CheckResult, or None when the edit cannot be
+        # mapped onto this state and a full check is needed.
+        if not self.valid or edit is None or edit.base_count != self.total:
+            return None
+
+        for pos, num in reversed(edit.removed):
+            if not self.remove(pos, num):
+                self.valid = False
+                return None
+        for pos, num, side, anchor in edit.inserted:
+            if not self.insert(pos, num, side, anchor):
+                self.valid = False
+                return None
+
+        self.result = self.build_result(len(edit.inserted) - len(edit.removed))
+        return self.result
+
+    def build_result(self, delta):
+        base = self.result
+        analysis = dict(base.analysis)
+        # Placeholders are always written with arabic numerals
+        num_types = dict(analysis["num_types"])
+        num_types["arabic"] += delta
+        analysis["num_types"] = num_types
+        analysis["total_chapters"] += delta
+        analysis["sample_chapters"] = self.head[:SAMPLE_COUNT]
+
+        groups = [dict(group, count=self.total) for group in base.groups]
+        sequences = [seq for seq in base.sequences if seq.kind == "volumes"]
+        missing = []
+        prev_end = 0
+        for state in self.sequences:
+            seq = state.to_sequence(
+                self.mode, None if self.segmented else prev_end, self.max_gap
+            )
+            sequences.append(seq)
+            missing.extend(seq.missing)
+            prev_end = seq.end
+
+        result = CheckResult(
+            base.settings,
+            analysis,
+            groups,
+            sequences,
+            missing,
+            base.title_duplicates,
+        )
+        result.state = self
+        return result
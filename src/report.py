@@ -1,6 +1,22 @@
 import re
-
-from config import build_chapter_regex_str
+import unicodedata
+from collections import Counter
+
+from config import DEFAULT_MAX_GAP, split_suffixes
+from constants import MISSING_MARKER
+from intervals import (
+    count_intervals,
+    find_missing_intervals,
+    format_intervals,
+    split_gaps,
+)
+from matchers import (
+    RegexBudgetExceeded,
+    format_budget_error,
+    get_chapter_matcher,
+    get_vol_matcher,
+    guard_search,
+)
 from num_utils import (
     CN_NUM_LOWER,
     CN_NUM_UPPER,
@@ -8,7 +24,23 @@ from num_utils import (
     cn2an_simple,
     normalize_number_text,
 )
-from toc import get_nav_texts
+from perf import PerfRecorder, format_perf_lines, null_stage
+from recheck import SAMPLE_COUNT, CheckState, get_expected_start, is_order_issue
+from result import CheckResult, SequenceResult
+from spine import cross_check_spine
+from toc import load_toc
+
+
+PROGRESS_INTERVAL = 500
+TITLE_NOISE_PATTERN = re.compile(r"[\W_]+")
+TITLE_PREVIEW_NUMS = 10
+# Keys this short, or generic part markers, repeat across unrelated chapters
+TITLE_MIN_LENGTH = 2
+TITLE_STOP_WORDS = {"上", "中", "下", "番外", "完", "完结", "终", "大结局", "尾声", "后记"}
+
+
+class CheckCancelled(Exception):
+    pass
 
 
 def format_missing_chapters(missing, group_size=30):
@@ -17,91 +49,153 @@ def format_missing_chapters(missing, group_size=30):
 
     total = len(missing)
     if total <= group_size:
-        return ", ".join(str(x) for x in missing)
+        return format_intervals(missing)
 
     lines = []
     for i in range(0, total, group_size):
         group = missing[i : i + group_size]
         group_start = i + 1
         group_end = min(i + group_size, total)
-        group_str = ", ".join(str(x) for x in group)
-        lines.append(f"   [{group_start}-{group_end}] {group_str}")
+        lines.append(f"   [{group_start}-{group_end}] {format_intervals(group)}")
 
     return "\n" + "\n".join(lines)
 
 
-def check_sequence_report(
-    numbers, context_name="", mode="reset_1", prev_end=None, original_order=None
+def analyze_sequence(
+    numbers,
+    context_name="",
+    mode="reset_1",
+    prev_end=None,
+    original_order=None,
+    max_gap=None,
 ):
     if not numbers:
-        return None, [], []
+        return None
 
-    unique_numbers = sorted(list(set(numbers)))
+    unique_numbers = sorted(set(numbers))
     start, end = unique_numbers[0], unique_numbers[-1]
 
-    expected_start = None
-    if mode == "reset_1":
-        expected_start = 1
-    elif mode == "reset_0":
-        expected_start = 0
-    elif mode == "continuous" and prev_end is not None:
-        expected_start = prev_end + 1
+    missing, outliers = split_gaps(find_missing_intervals(unique_numbers), max_gap)
 
-    report = []
-    status_icon = "✅"
-    msg_prefix = ""
+    order_issues = []
+    if original_order:
+        for prev_num, curr_num in zip(original_order, original_order[1:]):
+            if is_order_issue(prev_num, curr_num):
+                order_issues.append((prev_num, curr_num))
+
+    duplicates = []
+    if len(numbers) != len(unique_numbers):
+        counter = Counter(numbers)
+        duplicates = [(num, count) for num, count in counter.items() if count > 1]
+
+    return SequenceResult(
+        context_name,
+        start,
+        end,
+        get_expected_start(mode, prev_end),
+        len(numbers),
+        missing,
+        outliers,
+        order_issues,
+        duplicates,
+    )
 
-    if expected_start is not None and start != expected_start:
-        msg_prefix = f"[起始错误: {start} (应为 {expected_start})]"
-        status_icon = "⚠️ "
 
-    full = set(range(start, end + 1))
-    found = set(unique_numbers)
-    missing = sorted(list(full - found))
+def format_order_issue(prev_num, curr_num):
+    diff = curr_num - prev_num
+    if diff < 0:
+        return f"{prev_num}→{curr_num} (倒退)"
+    return f"{prev_num}→{curr_num} (跳过{diff - 1}章)"
 
-    report.append(f"📌 {context_name}")
+
+def format_outlier(gap_start, gap_end):
+    return f"{gap_start - 1}→{gap_end + 1} (跳过{gap_end - gap_start + 1}章)"
+
+
+def format_duplicate(num, count):
+    return f"第{num}章 出现{count}次"
+
+
+def format_sequence_report(seq):
+    report = []
+    start, end = seq.start, seq.end
+    missing = seq.missing
+    outliers = seq.outliers
+
+    report.append(f"📌 {seq.name}")
 
     if missing:
         formatted = format_missing_chapters(missing)
-        report.append(f"   🔴 缺失 ({len(missing)} 章): {formatted}")
+        report.append(f"   🔴 缺失 ({count_intervals(missing)} 章): {formatted}")
+        report.append(f"   ℹ️  范围: {start} -> {end}")
+    elif outliers:
         report.append(f"   ℹ️  范围: {start} -> {end}")
+    elif seq.start_error:
+        report.append(f"   ⚠️  连续 [起始错误: {start} (应为 {seq.expected_start})]")
     else:
-        if msg_prefix:
-            report.append(f"   {status_icon} 连续 {msg_prefix}")
-        else:
-            report.append(f"   {status_icon} 完整 ({start} -> {end})")
-
-    if original_order and len(original_order) > 1:
-        order_issues = []
-        for i in range(1, len(original_order)):
-            prev_num = original_order[i - 1]
-            curr_num = original_order[i]
-            diff = curr_num - prev_num
-            if diff > 1:
-                order_issues.append(f"{prev_num}→{curr_num} (跳过{diff - 1}章)")
-            elif diff < 0:
-                order_issues.append(f"{prev_num}→{curr_num} (倒退)")
-
-        if order_issues:
-            report.append(f"   ⚠️  顺序异常 ({len(order_issues)} 处):")
-            for issue in order_issues[:10]:
-                report.append(f"      • {issue}")
-            if len(order_issues) > 10:
-                report.append(f"      ... 等 {len(order_issues)} 处")
-
-    if len(numbers) != len(set(numbers)):
-        from collections import Counter
+        report.append(f"   ✅ 完整 ({start} -> {end})")
+
+    if outliers:
+        report.append(f"   ⚠️  异常跳跃 ({len(outliers)} 处，疑似章节号识别错误，未展开):")
+        for gap_start, gap_end in outliers[:10]:
+            report.append(f"      • {format_outlier(gap_start, gap_end)}")
+        if len(outliers) > 10:
+            report.append(f"      ... 等 {len(outliers)} 处")
+
+    order_issues = seq.order_issues
+    if order_issues:
+        report.append(f"   ⚠️  顺序异常 ({len(order_issues)} 处):")
+        for prev_num, curr_num in order_issues[:10]:
+            report.append(f"      • {format_order_issue(prev_num, curr_num)}")
+        if len(order_issues) > 10:
+            report.append(f"      ... 等 {len(order_issues)} 处")
+
+    duplicates = seq.duplicates
+    if duplicates:
+        report.append(f"   ⚠️  重复章节 ({len(duplicates)} 个):")
+        for num, count in duplicates[:5]:
+            report.append(f"      • {format_duplicate(num, count)}")
+        if len(duplicates) > 5:
+            report.append(f"      ... 等 {len(duplicates)} 个")
+
+    return report
 
-        counter = Counter(numbers)
-        duplicates = [(num, count) for num, count in counter.items() if count > 1]
-        if duplicates:
-            report.append(f"   ⚠️  重复章节 ({len(duplicates)} 个):")
-            for num, count in duplicates[:5]:
-                report.append(f"      • 第{num}章 出现{count}次")
-            if len(duplicates) > 5:
-                report.append(f"      ... 等 {len(duplicates)} 个")
 
-    return end, report, missing
+def check_sequence_report(
+    numbers,
+    context_name="",
+    mode="reset_1",
+    prev_end=None,
+    original_order=None,
+    max_gap=None,
+):
+    seq = analyze_sequence(
+        numbers, context_name, mode, prev_end, original_order, max_gap
+    )
+    if seq is None:
+        return None, [], []
+    return seq.end, format_sequence_report(seq), seq.missing
+
+
+def normalize_title(text):
+    # Width, case, spacing and punctuation variants of one title share a key
+    if not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    key = text.casefold()
+    if key.isalnum():
+        return key
+    return TITLE_NOISE_PATTERN.sub("", key)
+
+
+def is_generic_title(key):
+    return len(key) < TITLE_MIN_LENGTH or key in TITLE_STOP_WORDS
+
+
+def find_title_duplicates(titles):
+    # Same title under different numbers: usually one chapter uploaded twice
+    return [
+        (title, nums) for title, nums in titles.values() if len(set(nums)) > 1
+    ]
 
 
 def split_by_reset(chapters):
@@ -124,18 +218,16 @@ def split_by_reset(chapters):
     return segments
 
 
-def analyze_chapter_format(texts, config):
-    prefix = config["chap_prefix"]
-    suffix = config["chap_suffix"]
-    chap_regex_str = build_chapter_regex_str(config)
-    vol_regex_str = config.get("vol_regex", "")
-
-    try:
-        chap_re = re.compile(chap_regex_str)
-        vol_re = re.compile(vol_regex_str) if vol_regex_str else None
-    except:
-        return None
-
+def scan_toc_texts(
+    texts,
+    chap_re,
+    vol_re=None,
+    enable_vol=False,
+    progress=None,
+    perf=None,
+    records=None,
+    title_dupes=False,
+):
     num_types = {"arabic": 0, "cn_lower": 0, "cn_upper": 0, "variant": 0}
     sample_chapters = []
     has_volume = False
@@ -143,13 +235,73 @@ def analyze_chapter_format(texts, config):
     cn_lower_chars = set(CN_NUM_LOWER)
     cn_upper_chars = set(CN_NUM_UPPER)
 
+    group_by_vol = enable_vol and vol_re is not None
+    data = {}
+    volume_order = []
+    all_chapters_ordered = []
+    by_suffix = "suffix" in chap_re.groupindex
+    series = {}
+    titles = {}
+    # Title keys are only worth their cost when something reads them
+    keep_titles = title_dupes or records is not None
+
+    if group_by_vol:
+        current_vol = -1
+    else:
+        current_vol = 0
+        data[0] = []
+        volume_order.append(0)
+
+    total_texts = len(texts) if hasattr(texts, "__len__") else 0
+    text_count = 0
+
+    chap_search = chap_re.search
+    vol_search = guard_search(vol_re.search) if vol_re else None
+    to_number = cn2an_simple
+    if perf:
+        texts = perf.timed_iter("xml_parse", texts)
+        chap_search = perf.timed_call("regex", chap_search)
+        if vol_search:
+            vol_search = perf.timed_call("regex", vol_search)
+        to_number = perf.timed_call("numeral", to_number)
+
     for t in texts:
-        if vol_re and vol_re.search(t):
+        if progress and text_count % PROGRESS_INTERVAL == 0:
+            progress(text_count, total_texts, len(all_chapters_ordered))
+        text_count += 1
+
+        vm = None
+        if vol_search:
+            try:
+                vm = vol_search(t)
+            except RegexBudgetExceeded:
+                if group_by_vol:
+                    raise
+                # With volumes off the regex only feeds the has_volume hint,
+                # which is not worth failing the chapter check over
+                vol_search = None
+                has_volume = False
+        if vm:
             has_volume = True
+            if group_by_vol:
+                try:
+                    if vm.groups():
+                        v_num = to_number(vm.group(1))
+                    else:
+                        v_num = len(volume_order) + 1
+                    current_vol = v_num
+                    if current_vol not in data:
+                        data[current_vol] = []
+                        volume_order.append(current_vol)
+                    continue
+                except:
+                    pass
+
+        cm = chap_search(t)
+        if not cm:
             continue
 
-        cm = chap_re.search(t)
-        if cm:
+        if not vm:
             num_str = normalize_number_text(cm.group(1))
 
             if num_str.isdigit():
@@ -162,219 +314,483 @@ def analyze_chapter_format(texts, config):
             if "〇" in num_str or "两" in num_str:
                 num_types["variant"] += 1
 
-            if len(sample_chapters) < 5:
+            if len(sample_chapters) < SAMPLE_COUNT:
                 sample_chapters.append(t.strip()[:30])
 
+        try:
+            c_num = to_number(cm.group(1))
+            all_chapters_ordered.append(c_num)
+            target_vol = current_vol
+            if target_vol == -1:
+                target_vol = 0
+            if target_vol not in data:
+                data[target_vol] = []
+                if target_vol not in volume_order:
+                    volume_order.append(target_vol)
+            data[target_vol].append(c_num)
+            if keep_titles and MISSING_MARKER not in t:
+                title = (t[: cm.start()] + t[cm.end() :]).strip()
+                title_key = normalize_title(title)
+                if title_dupes and not is_generic_title(title_key):
+                    bucket = titles.get(title_key)
+                    if bucket is None:
+                        titles[title_key] = (title[:30], [c_num])
+                    else:
+                        bucket[1].append(c_num)
+                if records is not None:
+                    records.append((target_vol, c_num, title, title_key))
+            if by_suffix:
+                bucket = series.get(cm.group("suffix"))
+                if bucket is None:
+                    bucket = series[cm.group("suffix")] = {
+                        "data": {},
+                        "all_chapters_ordered": [],
+                    }
+                bucket["all_chapters_ordered"].append(c_num)
+                bucket["data"].setdefault(target_vol, []).append(c_num)
+        except:
+            pass
+
+    if progress:
+        progress(text_count, total_texts, len(all_chapters_ordered))
+
     total = sum(num_types.values()) - num_types["variant"]
 
     return {
-        "prefix": prefix,
-        "suffix": suffix,
         "num_types": num_types,
         "has_volume": has_volume,
         "total_chapters": total,
+        "text_count": text_count,
         "sample_chapters": sample_chapters,
+        "data": data,
+        "volume_order": volume_order,
+        "all_chapters_ordered": all_chapters_ordered,
+        "series": series,
+        "title_duplicates": find_title_duplicates(titles),
     }
 
 
-def perform_check(bk, config):
-    prefix = config["chap_prefix"]
-    num_type = config.get("chap_num_type", "mixed")
-    suffix = config["chap_suffix"]
-
-    chap_regex_str = build_chapter_regex_str(config)
-    enable_vol = config["enable_volume"]
-    vol_regex_str = config["vol_regex"]
-    mode = config["chap_reset_mode"]
-    auto_detect_reset = config.get("auto_detect_reset", False)
+def iter_group_sequences(
+    data,
+    volume_order,
+    segments,
+    mode,
+    enable_vol=False,
+    max_gap=None,
+    stage=null_stage,
+    group=None,
+):
+    if segments:
+        for idx, seg in enumerate(segments, 1):
+            with stage("sequence", len(seg)):
+                seq = analyze_sequence(seg, f"📑 分段 {idx}", mode, None, seg, max_gap)
+            seq.kind = "segment"
+            seq.group = group
+            yield seq, seg
+        return
 
-    file_id, toc_type = bk and __safe_get_toc(bk) or (None, None)
-    toc_info = f"{toc_type.upper()}" if toc_type else "未找到"
+    prev_end = 0
+    for vol in volume_order:
+        chapters = data.get(vol, [])
+        if not chapters:
+            continue
 
-    report_lines = []
+        if vol == 0 and not enable_vol:
+            name, kind = "📖 全书", "book"
+        elif vol == 0:
+            name, kind = "📂 未分类", "unsorted"
+        else:
+            name, kind = f"📑 第 {vol} 卷", "volume"
 
-    report_lines.append("=" * 50)
-    report_lines.append("📋 检测配置")
-    report_lines.append("=" * 50)
-    report_lines.append(f"   前缀: 「{prefix}」")
-    report_lines.append(f"   后缀: 「{suffix}」")
-    report_lines.append(f"   数字类型: {NUM_TYPE_NAMES.get(num_type, num_type)}")
-    report_lines.append(f"   目录来源: {toc_info}")
-    mode_str = "按卷" if enable_vol else ("自动分段" if auto_detect_reset else "全书")
-    report_lines.append(f"   检测模式: {mode_str}")
-    if enable_vol:
-        report_lines.append(f"   卷正则: {vol_regex_str}")
-    report_lines.append("")
+        if mode == "continuous" and vol == volume_order[0]:
+            prev_end = 0
 
-    try:
-        chap_re = re.compile(chap_regex_str)
-        vol_re = re.compile(vol_regex_str) if (enable_vol and vol_regex_str) else None
-    except Exception as e:
-        return f"❌ 正则错误: {e}", []
-
-    texts = get_nav_texts(bk)
-    if not texts:
-        return "❌ 错误: 无法找到或解析目录文件 (nav.xhtml/toc.ncx)", []
-
-    analysis = analyze_chapter_format(texts, config)
-    if analysis:
-        report_lines.append("=" * 50)
-        report_lines.append("📊 目录分析")
-        report_lines.append("=" * 50)
-        report_lines.append(f"   识别章节数: {analysis['total_chapters']}")
-
-        nt = analysis["num_types"]
-        type_parts = []
-        if nt["arabic"] > 0:
-            type_parts.append(f"阿拉伯数字 {nt['arabic']}")
-        if nt["cn_lower"] > 0:
-            type_parts.append(f"中文小写 {nt['cn_lower']}")
-        if nt["cn_upper"] > 0:
-            type_parts.append(f"中文大写 {nt['cn_upper']}")
-        if type_parts:
-            report_lines.append(f"   数字分布: {', '.join(type_parts)}")
-
-        if nt["variant"] > 0:
-            report_lines.append(f"   变体字符: 有 ({nt['variant']} 处，含〇或两)")
-        else:
-            report_lines.append(f"   变体字符: 无")
+        with stage("sequence", len(chapters)):
+            seq = analyze_sequence(chapters, name, mode, prev_end, chapters, max_gap)
+        seq.kind = kind
+        seq.group = group
+        yield seq, chapters
 
-        report_lines.append(
-            f"   检测到分卷: {'是' if analysis['has_volume'] else '否'}"
-        )
+        prev_end = seq.end
 
-        if analysis["sample_chapters"]:
-            report_lines.append(f"   示例章节:")
-            for s in analysis["sample_chapters"][:3]:
-                report_lines.append(f"      • {s}")
-        report_lines.append("")
 
-    report_lines.append("=" * 50)
-    report_lines.append("🔍 检查结果")
-    report_lines.append("=" * 50)
+def find_segments(chapters, auto_detect_reset=False, enable_vol=False):
+    if not auto_detect_reset or enable_vol or not chapters:
+        return None
+    segments = split_by_reset(chapters)
+    return segments if len(segments) > 1 else None
 
-    data = {}
-    volume_order = []
-    current_vol = 0
-    all_chapters_ordered = []
 
-    if enable_vol and vol_re:
-        current_vol = -1
+def render_settings(settings):
+    lines = ["=" * 50, "📋 检测配置", "=" * 50]
+    lines.append(f"   前缀: 「{settings['prefix']}」")
+    if settings.get("suffixes"):
+        lines.append(f"   后缀: 「{' / '.join(settings['suffixes'])}」（分别检测）")
     else:
-        data[0] = []
-        volume_order.append(0)
+        lines.append(f"   后缀: 「{settings['suffix']}」")
+    num_type = settings["num_type"]
+    lines.append(f"   数字类型: {NUM_TYPE_NAMES.get(num_type, num_type)}")
+    toc_type = settings.get("toc_type")
+    lines.append(f"   目录来源: {toc_type.upper() if toc_type else '未找到'}")
+    if settings["enable_volume"]:
+        mode_str = "按卷"
+    elif settings["auto_detect_reset"]:
+        mode_str = "自动分段"
+    else:
+        mode_str = "全书"
+    lines.append(f"   检测模式: {mode_str}")
+    if settings["enable_volume"]:
+        lines.append(f"   卷正则: {settings['vol_regex']}")
+    if settings.get("max_gap"):
+        lines.append(
+            f"   异常跳跃阈值: 连续缺失超过 {settings['max_gap']} 章按异常跳跃列出，不计入缺失"
+        )
+    lines.append("")
+    return lines
+
+
+def render_analysis(analysis):
+    lines = ["=" * 50, "📊 目录分析", "=" * 50]
+    lines.append(f"   识别章节数: {analysis['total_chapters']}")
+
+    nt = analysis["num_types"]
+    type_parts = []
+    if nt["arabic"] > 0:
+        type_parts.append(f"阿拉伯数字 {nt['arabic']}")
+    if nt["cn_lower"] > 0:
+        type_parts.append(f"中文小写 {nt['cn_lower']}")
+    if nt["cn_upper"] > 0:
+        type_parts.append(f"中文大写 {nt['cn_upper']}")
+    if type_parts:
+        lines.append(f"   数字分布: {', '.join(type_parts)}")
+
+    if nt["variant"] > 0:
+        lines.append(f"   变体字符: 有 ({nt['variant']} 处，含〇或两)")
+    else:
+        lines.append(f"   变体字符: 无")
 
-    for t in texts:
-        if enable_vol and vol_re:
-            vm = vol_re.search(t)
-            if vm:
-                try:
-                    if vm.groups():
-                        v_num = cn2an_simple(vm.group(1))
-                    else:
-                        v_num = len(volume_order) + 1
-                    current_vol = v_num
-                    if current_vol not in data:
-                        data[current_vol] = []
-                        volume_order.append(current_vol)
-                    continue
-                except:
-                    pass
+    lines.append(f"   检测到分卷: {'是' if analysis['has_volume'] else '否'}")
 
-        cm = chap_re.search(t)
-        if cm:
-            try:
-                c_num = cn2an_simple(cm.group(1))
-                all_chapters_ordered.append(c_num)
-                target_vol = current_vol
-                if target_vol == -1:
-                    target_vol = 0
-                if target_vol not in data:
-                    data[target_vol] = []
-                    if target_vol not in volume_order:
-                        volume_order.append(target_vol)
-                data[target_vol].append(c_num)
-            except:
-                pass
-
-    all_missing = []
-
-    if auto_detect_reset and not enable_vol and all_chapters_ordered:
-        segments = split_by_reset(all_chapters_ordered)
-        if len(segments) > 1:
-            report_lines.append(f"📊 检测到 {len(segments)} 个分段（章节号重置点）")
-            report_lines.append("-" * 20)
-
-            has_content = False
-            for idx, seg in enumerate(segments, 1):
-                if not seg:
-                    continue
-                has_content = True
-                name = f"📑 分段 {idx}"
-                _, r, missing = check_sequence_report(
-                    seg, name, mode=mode, prev_end=None, original_order=seg
-                )
-                report_lines.extend(r)
-                all_missing.extend(missing)
+    if analysis["sample_chapters"]:
+        lines.append(f"   示例章节:")
+        for s in analysis["sample_chapters"][:3]:
+            lines.append(f"      • {s}")
+    lines.append("")
 
-            if not has_content:
-                report_lines.append("⚠️  未找到匹配的章节")
+    lines.extend(["=" * 50, "🔍 检查结果", "=" * 50])
+    return lines
 
-            return "\n".join(report_lines), all_missing
 
-    if enable_vol and len(volume_order) > 0:
-        real_vols = [v for v in volume_order if v != 0]
-        if real_vols:
-            _, r, _ = check_sequence_report(real_vols, "📚 卷序列", mode="reset_1")
-            report_lines.extend(r)
-            report_lines.append("-" * 20)
+def render_volume_sequence(seq):
+    return format_sequence_report(seq) + ["-" * 20]
 
-    prev_end = 0
-    has_content = False
 
-    for vol in volume_order:
-        chapters = data.get(vol, [])
-        if not chapters:
-            continue
+def render_group_header(group):
+    lines = []
+    if group["suffix"] is not None:
+        lines.append(f"🔖 「{group['suffix']}」系列 ({group['count']} 条)")
+        lines.append("-" * 20)
+    if group["segments"]:
+        lines.append(f"📊 检测到 {group['segments']} 个分段（章节号重置点）")
+        lines.append("-" * 20)
+    return lines
+
+
+def render_group_footer(group):
+    return [""] if group["suffix"] is not None else []
 
-        has_content = True
-        if vol == 0 and not enable_vol:
-            name = "📖 全书"
-        elif vol == 0:
-            name = "📂 未分类"
-        else:
-            name = f"📑 第 {vol} 卷"
 
-        current_mode = mode
-        if mode == "continuous" and vol == volume_order[0]:
-            prev_end = 0
+def render_no_content(settings):
+    lines = ["⚠️  未找到匹配的章节", "   -> 请检查设置是否正确"]
+    if not settings.get("toc_type"):
+        lines.append("   -> 未在 EPUB 中找到 nav.xhtml 或 toc.ncx")
+    return lines
+
+
+def format_title_duplicate(title, nums):
+    shown = ", ".join(f"第{n}章" for n in nums[:TITLE_PREVIEW_NUMS])
+    if len(nums) > TITLE_PREVIEW_NUMS:
+        shown += f" ... 等 {len(nums)} 处"
+    return f"「{title}」: {shown}"
+
+
+def render_title_duplicates(groups):
+    lines = [
+        "",
+        f"📝 疑似重复上传 ({len(groups)} 组，标题相同但章节号不同):",
+    ]
+    for title, nums in groups:
+        lines.append(f"   • {format_title_duplicate(title, nums)}")
+    return lines
+
+
+def render_spine(spine):
+    lines = ["", "=" * 50, "📄 正文标题交叉检查", "=" * 50]
+    lines.append(
+        f"   扫描正文文件: {spine['file_count']}，识别章节标题: {spine['chapter_count']}"
+    )
+    if spine["segments"]:
+        lines.append(f"📊 检测到 {spine['segments']} 个分段（章节号重置点）")
+        lines.append("-" * 20)
+    for seq in spine["sequences"]:
+        lines.extend(format_sequence_report(seq))
+
+    not_in_toc = spine["not_in_toc"]
+    if not_in_toc:
+        lines.append(f"   ⚠️  正文有但目录未收录 ({len(not_in_toc)} 个):")
+        for href, heading, _ in not_in_toc[:10]:
+            lines.append(f"      • {heading} ({href})")
+        if len(not_in_toc) > 10:
+            lines.append(f"      ... 等 {len(not_in_toc)} 个")
+
+    mismatched = spine["mismatched"]
+    if mismatched:
+        lines.append(f"   ⚠️  目录指向不符 ({len(mismatched)} 处):")
+        for text, href, num in mismatched[:10]:
+            lines.append(f"      • 「{text}」→ {href} (正文为第{num}章)")
+        if len(mismatched) > 10:
+            lines.append(f"      ... 等 {len(mismatched)} 处")
+
+    if not not_in_toc and not mismatched:
+        lines.append("   ✅ 正文与目录一致")
+    return lines
+
+
+def render_perf(perf_data):
+    return [""] + format_perf_lines(perf_data)
+
+
+def iter_report_lines(result):
+    if result.error:
+        yield f"❌ {result.error}"
+        return
+
+    yield from render_settings(result.settings)
+    yield from render_analysis(result.analysis)
+
+    for seq in result.sequences:
+        if seq.kind == "volumes":
+            yield from render_volume_sequence(seq)
+
+    for group in result.groups:
+        yield from render_group_header(group)
+        for seq in result.group_sequences(group):
+            yield from format_sequence_report(seq)
+        yield from render_group_footer(group)
+
+    if not result.has_chapters:
+        yield from render_no_content(result.settings)
+
+    if result.title_duplicates:
+        yield from render_title_duplicates(result.title_duplicates)
+
+    if result.spine is not None:
+        yield from render_spine(result.spine)
+    elif result.settings.get("check_spine"):
+        yield ""
+        yield "⚠️  当前环境无法读取书脊，已跳过正文标题检查"
+
+    if result.perf:
+        yield from render_perf(result.perf)
+
 
-        last_chap, r, missing = check_sequence_report(
-            chapters,
-            name,
-            mode=current_mode,
-            prev_end=prev_end,
-            original_order=chapters,
+def render_text(result):
+    return "\n".join(iter_report_lines(result))
+
+
+def check_spine_headings(bk, doc, config, chap_re, mode, max_gap=None):
+    spine = cross_check_spine(bk, doc, config, chap_re)
+    nums = [num for _, _, num in spine["spine_chapters"]]
+    segments = find_segments(nums, auto_detect_reset=True)
+    sequences = [
+        seq
+        for seq, _ in iter_group_sequences(
+            {0: nums}, [0], segments, mode, max_gap=max_gap
         )
-        report_lines.extend(r)
-        all_missing.extend(missing)
+    ]
+    return {
+        "file_count": spine["file_count"],
+        "chapter_count": len(nums),
+        "segments": len(segments) if segments else 0,
+        "sequences": sequences,
+        "not_in_toc": spine["not_in_toc"],
+        "mismatched": spine["mismatched"],
+    }
+
+
+def perform_check(
+    bk, config, doc=None, progress=None, emit=None, perf=None, keep_state=False
+):
+    if perf is None and config.get("show_perf", False):
+        perf = PerfRecorder()
+    # The first stage starts tracemalloc; it must not outlive the check,
+    # including the early returns for unusable TOCs and settings
+    try:
+        return run_check(bk, config, doc, progress, emit, perf, keep_state)
+    finally:
+        if perf:
+            perf.finish()
+
 
-        if last_chap is not None:
-            prev_end = last_chap
+def run_check(bk, config, doc, progress, emit, perf, keep_state):
+    suffix = config["chap_suffix"]
+
+    multi_suffix = config.get("multi_suffix", False)
+    enable_vol = config["enable_volume"]
+    vol_regex_str = config["vol_regex"]
+    mode = config["chap_reset_mode"]
+    auto_detect_reset = config.get("auto_detect_reset", False)
+    max_gap = config.get("max_gap", DEFAULT_MAX_GAP)
+    check_spine = config.get("check_spine", False)
+    title_dupes = config.get("check_title_dupes", False)
 
-    if not has_content:
-        report_lines.append("⚠️  未找到匹配的章节")
-        report_lines.append("   -> 请检查设置是否正确")
-        if not file_id:
-            report_lines.append("   -> 未在 EPUB 中找到 nav.xhtml 或 toc.ncx")
+    stage = perf.stage if perf else null_stage
 
-    return "\n".join(report_lines), all_missing
+    if doc is None:
+        doc = load_toc(bk, perf)
 
+    settings = {
+        "prefix": config["chap_prefix"],
+        "suffix": suffix,
+        "suffixes": (
+            split_suffixes(config.get("custom_suffixes") or [suffix])
+            if multi_suffix
+            else None
+        ),
+        "num_type": config.get("chap_num_type", "mixed"),
+        "toc_type": doc.toc_type if doc else None,
+        "enable_volume": enable_vol,
+        "auto_detect_reset": auto_detect_reset,
+        "vol_regex": vol_regex_str,
+        "check_spine": check_spine,
+        "max_gap": max_gap,
+    }
+
+    def send(lines):
+        if emit and lines:
+            emit(lines)
 
-def __safe_get_toc(bk):
     try:
-        from toc import get_toc_source
+        chap_re = get_chapter_matcher(config, multi_suffix)
+    except Exception as e:
+        return CheckResult(settings, error=f"正则错误: {e}")
+
+    vol_re = None
+    if vol_regex_str:
+        # Unused volume regexes that fail to compile are ignored, as before
+        vol_re, vol_err = get_vol_matcher(vol_regex_str)
+        if vol_err and enable_vol:
+            return CheckResult(settings, error=vol_err)
+
+    texts = doc.iter_texts() if doc else []
+    with stage("scan") as stats:
+        try:
+            scan = scan_toc_texts(
+                texts,
+                chap_re,
+                vol_re,
+                enable_vol,
+                progress,
+                perf,
+                title_dupes=title_dupes,
+            )
+        except RegexBudgetExceeded:
+            return CheckResult(settings, error=format_budget_error())
+        if stats:
+            stats.items += len(scan["all_chapters_ordered"])
+    if not scan["text_count"]:
+        return CheckResult(
+            settings, error="错误: 无法找到或解析目录文件 (nav.xhtml/toc.ncx)"
+        )
+
+    analysis = {
+        "total_chapters": scan["total_chapters"],
+        "num_types": scan["num_types"],
+        "has_volume": scan["has_volume"],
+        "sample_chapters": scan["sample_chapters"],
+    }
+    result = CheckResult(settings, analysis)
+
+    with stage("format"):
+        send(render_settings(settings) + render_analysis(analysis))
+
+    volume_order = scan["volume_order"]
 
-        return get_toc_source(bk)
-    except Exception:
-        return None, None
+    if enable_vol and len(volume_order) > 0:
+        real_vols = [v for v in volume_order if v != 0]
+        if real_vols:
+            with stage("sequence", len(real_vols)):
+                seq = analyze_sequence(real_vols, "📚 卷序列", "reset_1", max_gap=max_gap)
+            seq.kind = "volumes"
+            result.sequences.append(seq)
+            send(render_volume_sequence(seq))
+
+    if multi_suffix:
+        series_list = [
+            (series_suffix, series["data"], series["all_chapters_ordered"])
+            for series_suffix, series in scan["series"].items()
+        ]
+        # Only the series of the selected suffix feeds placeholder insertion
+        primary = (split_suffixes([suffix]) or [None])[0]
+    else:
+        series_list = [(None, scan["data"], scan["all_chapters_ordered"])]
+        primary = None
+
+    for series_suffix, data, ordered in series_list:
+        segments = find_segments(ordered, auto_detect_reset, enable_vol)
+        group = {
+            "suffix": series_suffix,
+            "count": len(ordered),
+            "segments": len(segments) if segments else 0,
+        }
+        result.groups.append(group)
+        send(render_group_header(group))
+
+        group_missing = []
+        pairs = []
+        for seq, numbers in iter_group_sequences(
+            data, volume_order, segments, mode, enable_vol, max_gap, stage, series_suffix
+        ):
+            result.sequences.append(seq)
+            group_missing.extend(seq.missing)
+            pairs.append((seq, numbers))
+            send(format_sequence_report(seq))
+
+        send(render_group_footer(group))
+        if series_suffix == primary:
+            result.missing = group_missing
+
+        # Spine results and multi-suffix groups are not kept up to date by
+        # TOC edits, so those checks always need a full rerun
+        if keep_state and not multi_suffix and not check_spine and pairs:
+            result.state = CheckState.from_check(
+                result,
+                pairs,
+                ordered,
+                mode,
+                max_gap,
+                segments is not None,
+                auto_detect_reset and not enable_vol,
+            )
+
+    if not result.has_chapters:
+        send(render_no_content(settings))
+
+    result.title_duplicates = scan["title_duplicates"]
+    if result.title_duplicates:
+        send(render_title_duplicates(result.title_duplicates))
+
+    if check_spine and hasattr(bk, "spine_iter"):
+        with stage("spine") as stats:
+            result.spine = check_spine_headings(bk, doc, config, chap_re, mode, max_gap)
+            if stats:
+                stats.items += result.spine["file_count"]
+        send(render_spine(result.spine))
+    elif check_spine:
+        send(["", "⚠️  当前环境无法读取书脊，已跳过正文标题检查"])
+
+    if perf:
+        result.perf = perf.to_dict()
+        send(render_perf(result.perf))
+
+    return result
@@ -0,0 +1,163 @@
+from intervals import count_intervals
+
+
+def tuple_items(value):
+    return [tuple(x) if isinstance(x, list) else x for x in value]
+
+
+class SequenceResult:
+    __slots__ = (
+        "name",
+        "kind",
+        "group",
+        "start",
+        "end",
+        "expected_start",
+        "count",
+        "missing",
+        "outliers",
+        "order_issues",
+        "duplicates",
+    )
+
+    def __init__(
+        self,
+        name,
+        start,
+        end,
+        expected_start=None,
+        count=0,
+        missing=None,
+        outliers=None,
+        order_issues=None,
+        duplicates=None,
+        kind="book",
+        group=None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.group = group
+        self.start = start
+        self.end = end
+        self.expected_start = expected_start
+        self.count = count
+        self.missing = missing or []
+        self.outliers = outliers or []
+        self.order_issues = order_issues or []
+        self.duplicates = duplicates or []
+
+    @property
+    def missing_count(self):
+        return count_intervals(self.missing)
+
+    @property
+    def start_error(self):
+        return self.expected_start is not None and self.start != self.expected_start
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        seq = cls(data["name"], data["start"], data["end"])
+        for name in cls.__slots__:
+            if name in data:
+                value = data[name]
+                if isinstance(value, list):
+                    value = tuple_items(value)
+                setattr(seq, name, value)
+        return seq
+
+
+class CheckResult:
+    __slots__ = (
+        "settings",
+        "analysis",
+        "groups",
+        "sequences",
+        "missing",
+        "title_duplicates",
+        "spine",
+        "perf",
+        "error",
+        "state",
+    )
+
+    def __init__(
+        self,
+        settings=None,
+        analysis=None,
+        groups=None,
+        sequences=None,
+        missing=None,
+        title_duplicates=None,
+        spine=None,
+        perf=None,
+        error=None,
+        state=None,
+    ):
+        self.settings = settings or {}
+        self.analysis = analysis
+        self.groups = groups or []
+        self.sequences = sequences or []
+        self.missing = missing or []
+        self.title_duplicates = title_duplicates or []
+        self.spine = spine
+        self.perf = perf
+        self.error = error
+        # Incremental re-check state (recheck.CheckState); never serialized
+        self.state = state
+
+    @property
+    def missing_count(self):
+        return count_intervals(self.missing)
+
+    @property
+    def has_chapters(self):
+        return any(seq.kind != "volumes" for seq in self.sequences)
+
+    def group_sequences(self, group):
+        return [
+            seq
+            for seq in self.sequences
+            if seq.kind != "volumes" and seq.group == group["suffix"]
+        ]
+
+    def to_dict(self):
+        spine = None
+        if self.spine is not None:
+            spine = dict(self.spine)
+            spine["sequences"] = [seq.to_dict() for seq in spine["sequences"]]
+        return {
+            "settings": self.settings,
+            "analysis": self.analysis,
+            "groups": self.groups,
+            "sequences": [seq.to_dict() for seq in self.sequences],
+            "missing": self.missing,
+            "title_duplicates": self.title_duplicates,
+            "spine": spine,
+            "perf": self.perf,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        spine = data.get("spine")
+        if spine is not None:
+            spine = dict(spine)
+            spine["sequences"] = [
+                SequenceResult.from_dict(x) for x in spine["sequences"]
+            ]
+            spine["not_in_toc"] = tuple_items(spine["not_in_toc"])
+            spine["mismatched"] = tuple_items(spine["mismatched"])
+        return cls(
+            data.get("settings"),
+            data.get("analysis"),
+            data.get("groups"),
+            [SequenceResult.from_dict(x) for x in data.get("sequences", [])],
+            tuple_items(data.get("missing", [])),
+            tuple_items(data.get("title_duplicates", [])),
+            spine,
+            data.get("perf"),
+            data.get("error"),
+        )
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from config import CONFIG_FILE, DEFAULT_CONFIG
+from result import CheckResult
+
+CACHE_FILE = os.path.join(os.path.dirname(CONFIG_FILE), "result_cache.json")
+DEFAULT_CACHE_SIZE = DEFAULT_CONFIG["result_cache_size"]
+# Bump when the cached report/missing format changes
+CACHE_FORMAT = 6
+
+CACHE_KEY_FIELDS = (
+    "chap_prefix",
+    "chap_suffix",
+    "chap_num_type",
+    "enable_volume",
+    "vol_regex",
+    "chap_reset_mode",
+    "auto_detect_reset",
+    "multi_suffix",
+    "custom_suffixes",
+    "max_gap",
+    "check_title_dupes",
+)
+
+
+def config_fields_json(config):
+    fields = {k: config.get(k) for k in CACHE_KEY_FIELDS}
+    fields["format"] = CACHE_FORMAT
+    return json.dumps(fields, sort_keys=True, ensure_ascii=False)
+
+
+def config_fingerprint(config):
+    return hashlib.sha1(config_fields_json(config).encode("utf-8")).hexdigest()
+
+
+def make_cache_key(doc, config):
+    fields_json = config_fields_json(config)
+    return hashlib.sha1((doc.content_hash() + fields_json).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=CACHE_FILE, max_entries=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for key, value in json.load(f):
+                    self.entries[key] = value
+        except Exception:
+            self.entries.clear()
+
+    def save(self):
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(list(self.entries.items()), f, ensure_ascii=False)
+        except Exception:
+            pass
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return CheckResult.from_dict(entry)
+
+    def put(self, key, result):
+        if self.max_entries <= 0:
+            return
+        entry = result.to_dict()
+        old = self.entries.get(key)
+        # Loaded entries hold lists where fresh ones hold tuples, so they are
+        # compared in their saved form; an unchanged entry is not rewritten
+        changed = old is None or json.dumps(old, sort_keys=True) != json.dumps(
+            entry, sort_keys=True
+        )
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if not changed:
+            return
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.save()
@@ -0,0 +1,200 @@
+from pyqt_import import *
+
+from intervals import count_intervals, format_interval
+from report import (
+    format_duplicate,
+    format_order_issue,
+    format_outlier,
+    format_title_duplicate,
+)
+
+FETCH_BATCH = 200
+
+
+class ResultNode:
+    __slots__ = ("label", "parent", "row", "children", "pending", "formatter")
+
+    def __init__(self, label, parent=None, row=0, pending=None, formatter=None):
+        self.label = label
+        self.parent = parent
+        self.row = row
+        self.children = []
+        # Raw items not yet turned into child nodes; fetched in batches
+        self.pending = pending or []
+        self.formatter = formatter
+
+    def fetch(self, limit):
+        batch = self.pending[:limit]
+        del self.pending[:limit]
+        start = len(self.children)
+        for i, item in enumerate(batch):
+            self.children.append(ResultNode(self.formatter(item), self, start + i))
+        return len(batch)
+
+
+def sequence_summary(seq):
+    parts = []
+    if seq.missing:
+        parts.append(f"缺失 {count_intervals(seq.missing)} 章")
+    if seq.outliers:
+        parts.append(f"异常跳跃 {len(seq.outliers)}")
+    if seq.order_issues:
+        parts.append(f"顺序异常 {len(seq.order_issues)}")
+    if seq.duplicates:
+        parts.append(f"重复 {len(seq.duplicates)}")
+    if seq.start_error:
+        parts.append(f"起始 {seq.start} (应为 {seq.expected_start})")
+    if not parts:
+        return f"✅ 完整 ({seq.start} -> {seq.end})"
+    return f"{seq.start} -> {seq.end}，" + "，".join(parts)
+
+
+def sequence_categories(seq):
+    return [
+        (
+            f"🔴 缺失 ({count_intervals(seq.missing)} 章, {len(seq.missing)} 段)",
+            seq.missing,
+            lambda item: format_interval(*item),
+        ),
+        (
+            f"⚠️ 异常跳跃 ({len(seq.outliers)} 处)",
+            seq.outliers,
+            lambda item: format_outlier(*item),
+        ),
+        (
+            f"⚠️ 顺序异常 ({len(seq.order_issues)} 处)",
+            seq.order_issues,
+            lambda item: format_order_issue(*item),
+        ),
+        (
+            f"⚠️ 重复章节 ({len(seq.duplicates)} 个)",
+            seq.duplicates,
+            lambda item: format_duplicate(*item),
+        ),
+    ]
+
+
+class ResultTreeModel(QAbstractItemModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.result = None
+        self.filter_text = ""
+        self.root = ResultNode("")
+        self.fetching = False
+
+    def set_result(self, result):
+        self.result = result
+        self.rebuild()
+
+    def set_filter(self, text):
+        self.filter_text = text.strip()
+        self.rebuild()
+
+    def rebuild(self):
+        self.beginResetModel()
+        self.root = ResultNode("")
+        sequences = self.result.sequences if self.result else []
+        needle = self.filter_text
+
+        for seq in sequences:
+            name = f"🔖 「{seq.group}」{seq.name}" if seq.group else seq.name
+            name_match = not needle or needle in name
+            seq_node = ResultNode(f"📌 {name}    {sequence_summary(seq)}", self.root)
+            for label, items, formatter in sequence_categories(seq):
+                if not items:
+                    continue
+                if not name_match:
+                    items = [x for x in items if needle in formatter(x)]
+                    if not items:
+                        continue
+                seq_node.children.append(
+                    ResultNode(
+                        label,
+                        seq_node,
+                        len(seq_node.children),
+                        list(items),
+                        formatter,
+                    )
+                )
+            if name_match or seq_node.children:
+                seq_node.row = len(self.root.children)
+                self.root.children.append(seq_node)
+
+        groups = self.result.title_duplicates if self.result else []
+        if groups:
+            label = f"📝 疑似重复上传 ({len(groups)} 组)"
+            formatter = lambda item: format_title_duplicate(*item)
+            if needle and needle not in label:
+                groups = [x for x in groups if needle in formatter(x)]
+            if groups:
+                self.root.children.append(
+                    ResultNode(
+                        label,
+                        self.root,
+                        len(self.root.children),
+                        list(groups),
+                        formatter,
+                    )
+                )
+        self.endResetModel()
+
+    def node(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if column != 0 or row < 0 or row >= len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        return bool(node.children or node.pending)
+
+    def canFetchMore(self, parent):
+        return not self.fetching and bool(self.node(parent).pending)
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        count = min(FETCH_BATCH, len(node.pending))
+        if self.fetching or not count:
+            return
+        # Views may call back into fetchMore while rows are being inserted
+        self.fetching = True
+        try:
+            start = len(node.children)
+            self.beginInsertRows(parent, start, start + count - 1)
+            node.fetch(count)
+            self.endInsertRows()
+        finally:
+            self.fetching = False
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return index.internalPointer().label
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return "检查结果"
+        return None
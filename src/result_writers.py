@@ -0,0 +1,87 @@
+import csv
+import json
+
+from intervals import format_intervals
+
+CSV_FIELDS = (
+    "path",
+    "status",
+    "group",
+    "sequence",
+    "kind",
+    "start",
+    "end",
+    "count",
+    "missing_count",
+    "missing",
+    "outliers",
+    "order_issues",
+    "duplicates",
+    "error",
+)
+
+
+def format_result_line(path, status, detail):
+    return "\t".join(x for x in (path, status, detail) if x)
+
+
+class TsvResultWriter:
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, path, status, detail, result=None):
+        self.fp.write(format_result_line(path, status, detail) + "\n")
+
+
+class JsonLinesResultWriter:
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, path, status, detail, result=None):
+        record = {"path": path, "status": status}
+        if result is not None:
+            record.update(result.to_dict())
+        elif detail:
+            record["error"] = detail
+        self.fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class CsvResultWriter:
+    def __init__(self, fp):
+        self.writer = csv.writer(fp)
+        self.writer.writerow(CSV_FIELDS)
+
+    def write(self, path, status, detail, result=None):
+        sequences = result.sequences if result is not None else []
+        if not sequences:
+            error = result.error if result is not None else detail
+            self.writer.writerow([path, status] + [""] * 11 + [error or ""])
+            return
+
+        # One row per sequence; full lists stay in the JSON Lines output
+        for seq in sequences:
+            self.writer.writerow(
+                [
+                    path,
+                    status,
+                    seq.group or "",
+                    seq.name,
+                    seq.kind,
+                    seq.start,
+                    seq.end,
+                    seq.count,
+                    seq.missing_count,
+                    format_intervals(seq.missing),
+                    len(seq.outliers),
+                    len(seq.order_issues),
+                    len(seq.duplicates),
+                    "",
+                ]
+            )
+
+
+RESULT_WRITERS = {
+    "tsv": TsvResultWriter,
+    "jsonl": JsonLinesResultWriter,
+    "csv": CsvResultWriter,
+}
@@ -0,0 +1,157 @@
+import html
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from num_utils import cn2an_simple
+from toc import TAG_PATTERN
+
+
+SPINE_WORKERS = 8
+HEADING_SCAN_LIMIT = 64 * 1024
+HEADING_PATTERN = re.compile(r"<(h[1-3])\b[^>]*>(.*?)</\1\s*>", re.IGNORECASE | re.DOTALL)
+TITLE_PATTERN = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+HTML_MIME_HINTS = ("html", "xml")
+
+
+def clean_heading(raw):
+    return WHITESPACE_PATTERN.sub(" ", html.unescape(TAG_PATTERN.sub("", raw))).strip()
+
+
+def find_heading(text):
+    m = HEADING_PATTERN.search(text)
+    if m:
+        return clean_heading(m.group(2))
+    return None
+
+
+def find_title(text):
+    m = TITLE_PATTERN.search(text)
+    if m:
+        return clean_heading(m.group(1))
+    return None
+
+
+def iter_file_text(bk, manifest_id):
+    if hasattr(bk, "iter_chunks"):
+        yield from bk.iter_chunks(manifest_id)
+    else:
+        data = bk.readfile(manifest_id)
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", errors="replace")
+        yield data
+
+
+def read_heading(bk, manifest_id):
+    # Headings sit near the top of a chapter file, so stop at the first
+    # h1-h3 and never look further than HEADING_SCAN_LIMIT characters.
+    buf = ""
+    title = None
+    chunks = iter_file_text(bk, manifest_id)
+    try:
+        for chunk in chunks:
+            buf += chunk
+            if title is None:
+                title = find_title(buf)
+            heading = find_heading(buf)
+            if heading:
+                return heading
+            if len(buf) >= HEADING_SCAN_LIMIT:
+                break
+    finally:
+        chunks.close()
+    return title
+
+
+def get_spine_files(bk):
+    mimes = {manifest_id: mime for manifest_id, _, mime in bk.manifest_iter()}
+    files = []
+    for manifest_id, linear, href in bk.spine_iter():
+        mime = mimes.get(manifest_id, "")
+        if mime and not any(hint in mime for hint in HTML_MIME_HINTS):
+            continue
+        files.append((manifest_id, href))
+    return files
+
+
+def scan_spine_headings(bk, workers=SPINE_WORKERS):
+    files = get_spine_files(bk)
+
+    def scan(item):
+        manifest_id, href = item
+        try:
+            return manifest_id, href, read_heading(bk, manifest_id)
+        except Exception:
+            return manifest_id, href, None
+
+    if workers <= 1 or len(files) < 2:
+        return [scan(item) for item in files]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(scan, files))
+
+
+def resolve_toc_href(toc_href, href):
+    path = unquote(href.split("#", 1)[0])
+    if not path:
+        return None
+    return posixpath.normpath(posixpath.join(posixpath.dirname(toc_href), path))
+
+
+def get_toc_href(bk, file_id):
+    for manifest_id, href, _ in bk.manifest_iter():
+        if manifest_id == file_id:
+            return href
+    return ""
+
+
+def cross_check_spine(bk, doc, config, chap_re, workers=SPINE_WORKERS):
+    headings = scan_spine_headings(bk, workers)
+
+    spine_chapters = []
+    for manifest_id, href, heading in headings:
+        if not heading:
+            continue
+        m = chap_re.search(heading)
+        if not m:
+            continue
+        try:
+            num = cn2an_simple(m.group(1))
+        except:
+            continue
+        spine_chapters.append((posixpath.normpath(href), heading, num))
+
+    toc_href = get_toc_href(bk, doc.file_id) if doc else ""
+    toc_files = set()
+    if doc:
+        for entry in doc.entries:
+            path = resolve_toc_href(toc_href, entry.href or "")
+            if path:
+                toc_files.add(path)
+
+    not_in_toc = [item for item in spine_chapters if item[0] not in toc_files]
+
+    # Files shared by several TOC chapters (anchors into one file) are skipped,
+    # since a single heading cannot confirm all of them.
+    toc_chapters = {}
+    if doc:
+        for entry, num in doc.chapters(config):
+            path = resolve_toc_href(toc_href, entry.href or "")
+            if path:
+                toc_chapters.setdefault(path, []).append((entry.text, num))
+
+    spine_nums = {href: num for href, _, num in spine_chapters}
+    mismatched = []
+    for path, chapters in toc_chapters.items():
+        if len(chapters) == 1 and path in spine_nums:
+            text, num = chapters[0]
+            if spine_nums[path] != num:
+                mismatched.append((text, path, spine_nums[path]))
+
+    return {
+        "file_count": len(headings),
+        "spine_chapters": spine_chapters,
+        "not_in_toc": not_in_toc,
+        "mismatched": mismatched,
+    }
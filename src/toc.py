@@ -1,9 +1,182 @@
+import bisect
+import hashlib
+import html
 import re
-import xml.etree.ElementTree as ET
+from xml.parsers import expat
 
-from config import build_chapter_regex_str
 from constants import MISSING_CLASS, MISSING_MARKER
+from matchers import get_chapter_matcher
 from num_utils import cn2an_simple
+from intervals import iter_interval_numbers
+from perf import null_stage
+
+NAV_TOKEN_PATTERN = re.compile(
+    r"(?P<open><ol\b[^>]*>)|(?P<close></ol\s*>)"
+    r'|(?P<li><li[^>]*>\s*)?<a[^>]*href="(?P<href>[^"]*)"[^>]*>(?P<text>.*?)</a>(?P<li_end>\s*</li>)?',
+    re.IGNORECASE | re.DOTALL,
+)
+NCX_TOKEN_PATTERN = re.compile(
+    r"(?P<open><navPoint\b[^>]*>)|(?P<close></navPoint\s*>)"
+    r"|<text[^>]*>(?P<text>.*?)</text>"
+    r'|<content[^>]*src="(?P<src>[^"]*)"',
+    re.IGNORECASE | re.DOTALL,
+)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+ID_ATTR_PATTERN = re.compile(r'\bid="([^"]*)"')
+PLAY_ORDER_ATTR_PATTERN = re.compile(r'\s+playOrder="[^"]*"')
+PLAY_ORDER_TOKEN_PATTERN = re.compile(
+    r"<(?:navPoint|navTarget|pageTarget)\b[^>]*>"
+    r'|<content\b[^>]*\bsrc="(?P<src>[^"]*)"[^>]*>',
+    re.IGNORECASE,
+)
+NCX_PLACEHOLDER_PATTERN = re.compile(
+    rf'<navPoint[^>]*class="[^"]*{MISSING_CLASS}[^"]*"[^>]*>.*?</navPoint>\s*',
+    re.IGNORECASE | re.DOTALL,
+)
+TEXT_SEGMENT_PATTERN = re.compile(r">([^<]+)<")
+XML_FEED_CHUNK = 64 * 1024
+
+
+class TocEntry:
+    __slots__ = ("text", "href", "depth", "start", "end", "leaf")
+
+    def __init__(self, text, href, depth, start, end, leaf=True):
+        self.text = text
+        self.href = href
+        self.depth = depth
+        self.start = start
+        self.end = end
+        self.leaf = leaf
+
+
+class TocEdit:
+    # Chapter-order delta of one insert/remove, relative to doc.chapters(config).
+    # inserted: (pos, num, side, anchor), applied in order; anchor is the number
+    # expected next to pos (at pos when side is 1, at pos - 1 when side is 0).
+    # removed: (pos, num) in ascending order of the pre-edit positions.
+    __slots__ = ("base_count", "inserted", "removed")
+
+    def __init__(self, base_count, inserted=None, removed=None):
+        self.base_count = base_count
+        self.inserted = inserted or []
+        self.removed = removed or []
+
+
+class TocDocument:
+    def __init__(self, file_id, toc_type, content):
+        self.file_id = file_id
+        self.toc_type = toc_type
+        self.content = content
+        self._texts = None
+        self._entries = None
+        self._chapter_cache = {}
+
+    @property
+    def texts(self):
+        if self._texts is None:
+            self._texts = extract_texts_from_xml(self.content)
+        return self._texts
+
+    def iter_texts(self):
+        if self._texts is not None:
+            return iter(self._texts)
+        return iter_texts_from_xml(self.content)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            if self.toc_type == "nav":
+                self._entries = parse_nav_entries(self.content)
+            else:
+                self._entries = parse_ncx_entries(self.content)
+        return self._entries
+
+    def content_hash(self):
+        return hashlib.sha1(self.content.encode("utf-8")).hexdigest()
+
+    def chapters(self, config):
+        try:
+            chap_re = get_chapter_matcher(config)
+        except:
+            return []
+        if chap_re in self._chapter_cache:
+            return self._chapter_cache[chap_re]
+
+        chapters = []
+        for entry in self.entries:
+            cm = chap_re.search(entry.text)
+            if cm:
+                try:
+                    chapters.append((entry, cn2an_simple(cm.group(1))))
+                except:
+                    pass
+
+        self._chapter_cache[chap_re] = chapters
+        return chapters
+
+    def chapter_map(self, config):
+        return {c_num: entry.href for entry, c_num in self.chapters(config)}
+
+
+def clean_entry_text(raw):
+    return html.unescape(TAG_PATTERN.sub("", raw)).strip()
+
+
+def parse_nav_entries(content):
+    entries = []
+    depth = 0
+    for m in NAV_TOKEN_PATTERN.finditer(content):
+        if m.group("open"):
+            depth += 1
+        elif m.group("close"):
+            depth -= 1
+        else:
+            leaf = m.group("li") is not None and m.group("li_end") is not None
+            if leaf:
+                start, end = m.start(), m.end()
+            else:
+                start, end = m.start("href"), m.end("text")
+            text = clean_entry_text(m.group("text"))
+            entries.append(TocEntry(text, m.group("href"), depth, start, end, leaf))
+    return entries
+
+
+def parse_ncx_entries(content):
+    entries = []
+    stack = []
+    for m in NCX_TOKEN_PATTERN.finditer(content):
+        if m.group("open"):
+            if stack:
+                stack[-1].leaf = False
+            entry = TocEntry("", "", len(stack) + 1, m.start(), m.end())
+            stack.append(entry)
+            entries.append(entry)
+        elif m.group("close"):
+            if stack:
+                stack.pop().end = m.end()
+        elif not stack:
+            continue
+        elif m.group("text") is not None:
+            if not stack[-1].text:
+                stack[-1].text = clean_entry_text(m.group("text"))
+        elif not stack[-1].href:
+            stack[-1].href = m.group("src")
+    return entries
+
+
+def load_toc(bk, perf=None):
+    stage = perf.stage if perf else null_stage
+    try:
+        with stage("toc_source"):
+            file_id, toc_type = get_toc_source(bk)
+        if not file_id:
+            return None
+        with stage("read_toc"):
+            content = bk.readfile(file_id)
+    except Exception:
+        return None
+
+    return TocDocument(file_id, toc_type, content)
 
 
 def get_toc_source(bk):
@@ -24,177 +197,306 @@ def get_toc_source(bk):
     return None, None
 
 
-def extract_texts_from_xml(content):
+def iter_texts_from_xml(content):
+    # expat rather than ElementTree, so that after a parse error the regex
+    # fallback can resume from a byte offset instead of counting texts
+    data = content.encode("utf-8")
+    parser = expat.ParserCreate("utf-8")
+    parser.buffer_text = True
+    # Attributes are not needed; lists are cheaper to build than dicts
+    parser.ordered_attributes = True
+    parts = []
     texts = []
-    try:
-        clean_content = re.sub(r' xmlns="[^"]+"', "", content, count=1)
-        clean_content = re.sub(r' xmlns:[a-z]+="[^"]+"', "", clean_content)
-        root = ET.fromstring(clean_content)
-        for elem in root.iter():
-            if elem.text and elem.text.strip():
-                texts.append(elem.text.strip())
-            if elem.tail and elem.tail.strip():
-                texts.append(elem.tail.strip())
-    except Exception:
-        matches = re.findall(r">([^<]+)<", content)
-        texts = [m.strip() for m in matches if m.strip()]
-    return texts
-
-
-def get_nav_texts(bk):
-    file_id, toc_type = get_toc_source(bk)
-
-    if not file_id:
-        return []
+    resume = 0
+
+    def boundary(*args):
+        nonlocal resume
+        if parts:
+            text = "".join(parts).strip()
+            parts.clear()
+            if text:
+                texts.append(text)
+                # Only blank runs lie between here and the next text, so
+                # this is as good a restart point as any later boundary
+                resume = parser.CurrentByteIndex
+
+    parser.StartElementHandler = boundary
+    parser.EndElementHandler = boundary
+    parser.CharacterDataHandler = parts.append
 
     try:
-        content = bk.readfile(file_id)
-    except Exception:
-        return []
-
-    return extract_texts_from_xml(content)
-
-
-def get_chapter_info_from_nav(bk, config):
-    file_id, toc_type = get_toc_source(bk)
-    if not file_id or toc_type != "nav":
-        return None, None, {}
+        for pos in range(0, len(data), XML_FEED_CHUNK):
+            parser.Parse(data[pos : pos + XML_FEED_CHUNK], False)
+            yield from texts
+            texts.clear()
+        parser.Parse(b"", True)
+        boundary()
+        yield from texts
+    except expat.ExpatError:
+        # Texts the parser finished are kept; the one being read when the
+        # error hit and everything after it come from the regex
+        yield from texts
+        for m in TEXT_SEGMENT_PATTERN.finditer(data[resume:].decode("utf-8")):
+            text = m.group(1).strip()
+            if text:
+                yield text
 
-    content = bk.readfile(file_id)
 
-    chap_regex_str = build_chapter_regex_str(config)
-
-    try:
-        chap_re = re.compile(chap_regex_str)
-    except:
-        return file_id, content, {}
-
-    chapter_map = {}
-    pattern = re.compile(r'<a[^>]*href="([^"]*)"[^>]*>([^<]*)</a>', re.IGNORECASE)
-
-    for match in pattern.finditer(content):
-        href = match.group(1)
-        text = match.group(2).strip()
-        cm = chap_re.search(text)
-        if cm:
-            try:
-                c_num = cn2an_simple(cm.group(1))
-                chapter_map[c_num] = href
-            except:
-                pass
-
-    return file_id, content, chapter_map
+def extract_texts_from_xml(content):
+    return list(iter_texts_from_xml(content))
 
 
-def find_nearest_existing_href(missing_num, chapter_map, all_chapters):
-    sorted_chapters = sorted(all_chapters)
+def get_nav_texts(bk, doc=None):
+    if doc is None:
+        doc = load_toc(bk)
 
-    for c in sorted_chapters:
-        if c > missing_num and c in chapter_map:
-            return chapter_map[c]
+    return doc.texts if doc else []
 
-    for c in reversed(sorted_chapters):
-        if c < missing_num and c in chapter_map:
-            return chapter_map[c]
 
-    if chapter_map:
-        return list(chapter_map.values())[0]
+def get_chapter_info_from_nav(bk, config, doc=None):
+    if doc is None:
+        doc = load_toc(bk)
+    if not doc:
+        return None, None, {}
 
-    return "#"
+    return doc.file_id, doc.content, doc.chapter_map(config)
+
+
+def index_leaf_li_anchors(doc):
+    li_index = {}
+    for entry in doc.entries:
+        if entry.leaf:
+            li_index.setdefault(entry.href, (entry.start, entry.end))
+    return li_index
+
+
+def iter_missing_neighbours(missing_chapters, sorted_chapters):
+    lo = 0
+    hi = 0
+    total = len(sorted_chapters)
+
+    for missing_num in iter_interval_numbers(missing_chapters):
+        while lo < total and sorted_chapters[lo] < missing_num:
+            lo += 1
+        while hi < total and sorted_chapters[hi] <= missing_num:
+            hi += 1
+        prev_num = sorted_chapters[lo - 1] if lo > 0 else None
+        next_num = sorted_chapters[hi] if hi < total else None
+        yield missing_num, prev_num, next_num
+
+
+def splice_insertions(content, insertions):
+    # insertions: (offset, side, missing_num, markup); side 0 = after, 1 = before
+    insertions.sort()
+    parts = []
+    pos = 0
+    for offset, side, _, markup in insertions:
+        parts.append(content[pos:offset])
+        parts.append(markup + "\n" if side else "\n" + markup)
+        pos = offset
+    parts.append(content[pos:])
+    return "".join(parts)
+
+
+def build_insert_edit(chapters, insertions):
+    starts = [entry.start for entry, _ in chapters]
+    nums = [num for _, num in chapters]
+    inserted = []
+    prev_base = None
+    for offset, side, missing_num, _ in sorted(insertions):
+        base = bisect.bisect_left(starts, offset)
+        pos = base + len(inserted)
+        if side:
+            anchor = nums[base] if base < len(nums) else None
+        elif base == prev_base:
+            anchor = inserted[-1][1]
+        else:
+            anchor = nums[base - 1] if base > 0 else None
+        inserted.append((pos, missing_num, side, anchor))
+        prev_base = base
+    return TocEdit(len(chapters), inserted)
+
+
+def build_remove_edit(chapters, spans):
+    starts = [entry.start for entry, _ in chapters]
+    removed = []
+    for span_start, span_end in spans:
+        idx = bisect.bisect_left(starts, span_start)
+        while idx < len(starts) and starts[idx] < span_end:
+            removed.append((idx, chapters[idx][1]))
+            idx += 1
+    return TocEdit(len(chapters), removed=removed)
+
+
+def missing_title(config, missing_num):
+    prefix = config["chap_prefix"]
+    suffix = config["chap_suffix"]
+    return html.escape(f"{MISSING_MARKER}{prefix}{missing_num}{suffix}", quote=False)
 
 
-def insert_missing_chapters_to_nav(bk, config, missing_chapters):
-    file_id, content, chapter_map = get_chapter_info_from_nav(bk, config)
+def insert_missing_chapters_to_nav(bk, config, missing_chapters, doc=None):
+    if doc is None:
+        doc = load_toc(bk)
+    file_id, content, chapter_map = get_chapter_info_from_nav(bk, config, doc)
 
     if not file_id:
-        return 0, "未找到 nav.xhtml 文件"
+        return 0, "未找到目录文件 (nav.xhtml/toc.ncx)", None
 
     if not chapter_map:
-        return 0, "无法解析现有章节信息"
+        return 0, "无法解析现有章节信息", None
+
+    if doc.toc_type == "ncx":
+        return insert_missing_chapters_to_ncx(bk, config, missing_chapters, doc)
+
+    sorted_chapters = sorted(chapter_map)
+    fallback_href = next(iter(chapter_map.values()))
+    li_index = index_leaf_li_anchors(doc)
+
+    insertions = []
+    for missing_num, prev_num, next_num in iter_missing_neighbours(
+        missing_chapters, sorted_chapters
+    ):
+        prev_href = chapter_map[prev_num] if prev_num is not None else None
+        next_href = chapter_map[next_num] if next_num is not None else None
+
+        target_href = next_href or prev_href or fallback_href
+        title = missing_title(config, missing_num)
+        new_li = f'<li class="{MISSING_CLASS}"><a href="{target_href}">{title}</a></li>'
+
+        if next_href in li_index:
+            insertions.append((li_index[next_href][0], 1, missing_num, new_li))
+        elif prev_href in li_index:
+            insertions.append((li_index[prev_href][1], 0, missing_num, new_li))
+
+    if not insertions:
+        return 0, None, None
+
+    edit = build_insert_edit(doc.chapters(config), insertions)
+    bk.writefile(file_id, splice_insertions(content, insertions))
+
+    return len(insertions), None, edit
+
+
+def insert_missing_chapters_to_ncx(bk, config, missing_chapters, doc):
+    entry_map = {c_num: entry for entry, c_num in doc.chapters(config)}
+    if not entry_map:
+        return 0, "无法解析现有章节信息", None
+
+    sorted_chapters = sorted(entry_map)
+    fallback_href = next(iter(entry_map.values())).href
+    used_ids = set(ID_ATTR_PATTERN.findall(doc.content))
+
+    insertions = []
+    for missing_num, prev_num, next_num in iter_missing_neighbours(
+        missing_chapters, sorted_chapters
+    ):
+        prev_entry = entry_map[prev_num] if prev_num is not None else None
+        next_entry = entry_map[next_num] if next_num is not None else None
+        anchor = next_entry or prev_entry
+
+        target_href = anchor.href if anchor else fallback_href
+        point_id = f"{MISSING_CLASS}-{missing_num}"
+        suffix = 1
+        while point_id in used_ids:
+            suffix += 1
+            point_id = f"{MISSING_CLASS}-{missing_num}-{suffix}"
+        used_ids.add(point_id)
+
+        new_point = (
+            f'<navPoint id="{point_id}" class="{MISSING_CLASS}" playOrder="0">'
+            f"<navLabel><text>{missing_title(config, missing_num)}</text></navLabel>"
+            f'<content src="{target_href}"/></navPoint>'
+        )
 
-    prefix = config["chap_prefix"]
-    suffix = config["chap_suffix"]
-    all_chapters = set(chapter_map.keys())
-
-    inserted = 0
-    new_content = content
-
-    for missing_num in sorted(missing_chapters, reverse=True):
-        target_href = find_nearest_existing_href(missing_num, chapter_map, all_chapters)
-
-        missing_title = f"{MISSING_MARKER}{prefix}{missing_num}{suffix}"
-
-        new_li = f'<li class="{MISSING_CLASS}"><a href="{target_href}">{missing_title}</a></li>'
-
-        next_chapters = [c for c in sorted(all_chapters) if c > missing_num]
-        if next_chapters:
-            next_chap = min(next_chapters)
-            next_href = chapter_map.get(next_chap, "")
-            if next_href:
-                pattern = re.compile(
-                    rf'(<li[^>]*>\s*<a[^>]*href="{re.escape(next_href)}"[^>]*>[^<]*</a>\s*</li>)',
-                    re.IGNORECASE | re.DOTALL,
-                )
-                match = pattern.search(new_content)
-                if match:
-                    new_content = (
-                        new_content[: match.start()]
-                        + new_li
-                        + "\n"
-                        + new_content[match.start() :]
-                    )
-                    inserted += 1
-                    continue
-
-        prev_chapters = [c for c in sorted(all_chapters) if c < missing_num]
-        if prev_chapters:
-            prev_chap = max(prev_chapters)
-            prev_href = chapter_map.get(prev_chap, "")
-            if prev_href:
-                pattern = re.compile(
-                    rf'(<li[^>]*>\s*<a[^>]*href="{re.escape(prev_href)}"[^>]*>[^<]*</a>\s*</li>)',
-                    re.IGNORECASE | re.DOTALL,
-                )
-                match = pattern.search(new_content)
-                if match:
-                    new_content = (
-                        new_content[: match.end()]
-                        + "\n"
-                        + new_li
-                        + new_content[match.end() :]
-                    )
-                    inserted += 1
-                    continue
-
-    if inserted > 0:
-        bk.writefile(file_id, new_content)
-
-    return inserted, None
-
-
-def remove_missing_placeholders(bk):
-    file_id, toc_type = get_toc_source(bk)
-
-    if not file_id or toc_type != "nav":
-        return 0, "未找到 nav.xhtml 文件"
-
-    content = bk.readfile(file_id)
-
-    pattern = re.compile(
-        rf'<li[^>]*class="[^"]*{MISSING_CLASS}[^"]*"[^>]*>.*?</li>\s*',
-        re.IGNORECASE | re.DOTALL,
-    )
-
-    new_content, count = pattern.subn("", content)
-
-    if count == 0:
-        pattern2 = re.compile(
-            rf"<li[^>]*>\s*<a[^>]*>[^<]*{re.escape(MISSING_MARKER)}[^<]*</a>\s*</li>\s*",
+        if next_entry:
+            insertions.append((next_entry.start, 1, missing_num, new_point))
+        elif prev_entry:
+            insertions.append((prev_entry.end, 0, missing_num, new_point))
+
+    if not insertions:
+        return 0, None, None
+
+    edit = build_insert_edit(doc.chapters(config), insertions)
+    new_content = splice_insertions(doc.content, insertions)
+    bk.writefile(doc.file_id, renumber_play_order(new_content))
+
+    return len(insertions), None, edit
+
+
+def set_play_order(tag, order):
+    if PLAY_ORDER_ATTR_PATTERN.search(tag):
+        return PLAY_ORDER_ATTR_PATTERN.sub(f' playOrder="{order}"', tag, count=1)
+    end = -2 if tag.endswith("/>") else -1
+    return f'{tag[:end]} playOrder="{order}"{tag[end:]}'
+
+
+def renumber_play_order(content):
+    # Targets get numbers in document order; points sharing a src share a playOrder.
+    parts = []
+    pending = []
+    orders = {}
+    pos = 0
+
+    for m in PLAY_ORDER_TOKEN_PATTERN.finditer(content):
+        parts.append(content[pos : m.start()])
+        if m.group("src") is None:
+            pending.append(len(parts))
+            parts.append(m.group(0))
+        else:
+            order = orders.setdefault(m.group("src"), len(orders) + 1)
+            for idx in pending:
+                parts[idx] = set_play_order(parts[idx], order)
+            pending.clear()
+            parts.append(m.group(0))
+        pos = m.end()
+
+    parts.append(content[pos:])
+    return "".join(parts)
+
+
+def remove_spans(content, spans):
+    parts = []
+    pos = 0
+    for start, end in spans:
+        parts.append(content[pos:start])
+        pos = end
+    parts.append(content[pos:])
+    return "".join(parts)
+
+
+def remove_missing_placeholders(bk, doc=None, config=None):
+    if doc is None:
+        doc = load_toc(bk)
+
+    if not doc:
+        return 0, "未找到目录文件 (nav.xhtml/toc.ncx)", None
+
+    file_id = doc.file_id
+    content = doc.content
+
+    if doc.toc_type == "ncx":
+        spans = [m.span() for m in NCX_PLACEHOLDER_PATTERN.finditer(content)]
+    else:
+        pattern = re.compile(
+            rf'<li[^>]*class="[^"]*{MISSING_CLASS}[^"]*"[^>]*>.*?</li>\s*',
             re.IGNORECASE | re.DOTALL,
         )
-        new_content, count = pattern2.subn("", content)
+        spans = [m.span() for m in pattern.finditer(content)]
+
+        if not spans:
+            pattern2 = re.compile(
+                rf"<li[^>]*>\s*<a[^>]*>[^<]*{re.escape(MISSING_MARKER)}[^<]*</a>\s*</li>\s*",
+                re.IGNORECASE | re.DOTALL,
+            )
+            spans = [m.span() for m in pattern2.finditer(content)]
+
+    if not spans:
+        return 0, None, None
 
-    if count > 0:
-        bk.writefile(file_id, new_content)
+    new_content = remove_spans(content, spans)
+    if doc.toc_type == "ncx":
+        new_content = renumber_play_order(new_content)
+    bk.writefile(file_id, new_content)
 
-    return count, None
+    edit = build_remove_edit(doc.chapters(config), spans) if config else None
+    return len(spans), None, edit
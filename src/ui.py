@@ -1,9 +1,55 @@
 from pyqt_import import *
 
-from config import DEFAULT_VOL_REGEX, load_or_create_config, save_config
+from config import (
+    DEFAULT_MAX_GAP,
+    DEFAULT_VOL_REGEX,
+    load_or_create_config,
+    save_config,
+)
 from constants import MISSING_CLASS, MISSING_MARKER
-from report import perform_check
-from toc import insert_missing_chapters_to_nav, remove_missing_placeholders
+from infer import infer_config
+from intervals import count_intervals
+from perf import PerfRecorder
+from report import CheckCancelled, perform_check, render_text
+from result_cache import DEFAULT_CACHE_SIZE, ResultCache, make_cache_key
+from result_model import ResultTreeModel
+from toc import insert_missing_chapters_to_nav, load_toc, remove_missing_placeholders
+
+
+class TaskWorker(QThread):
+    progress = Signal(int, int, int)
+    partial = Signal(object)
+    succeeded = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, task, parent=None):
+        super().__init__(parent)
+        self.task = task
+        self.cancel_requested = False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def report_progress(self, scanned, total, parsed):
+        if self.cancel_requested:
+            raise CheckCancelled()
+        self.progress.emit(scanned, total, parsed)
+
+    def emit_lines(self, lines):
+        if self.cancel_requested:
+            raise CheckCancelled()
+        self.partial.emit(lines)
+
+    def run(self):
+        try:
+            result = self.task(self)
+        except CheckCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
 
 
 class MainDialog(QDialog):
@@ -11,6 +57,11 @@ class MainDialog(QDialog):
         super().__init__(parent)
         self.bk = bk
         self.config = config
+        self.toc_doc = None
+        cache_size = config.get("result_cache_size", DEFAULT_CACHE_SIZE)
+        self.result_cache = ResultCache(max_entries=cache_size)
+        self.worker = None
+        self.streamed = False
         self.setWindowTitle("章节缺失检查")
         self.resize(800, 600)
         self.init_ui()
@@ -28,6 +79,10 @@ class MainDialog(QDialog):
         self.inp_prefix.setMinimumWidth(80)
         self.inp_prefix.setPlaceholderText("第")
         row1.addWidget(self.inp_prefix)
+        self.btn_infer = QPushButton("自动识别")
+        self.btn_infer.setToolTip("抽样目录条目，自动推断前缀、后缀、数字类型和卷设置")
+        self.btn_infer.clicked.connect(self.do_infer)
+        row1.addWidget(self.btn_infer)
         row1.addSpacing(20)
 
         row1.addWidget(QLabel("数字类型:"))
@@ -44,6 +99,21 @@ class MainDialog(QDialog):
         self.combo_num_type.setMinimumWidth(120)
         row1.addWidget(self.combo_num_type)
         row1.addStretch()
+        self.chk_check_spine = QCheckBox("检查正文标题")
+        self.chk_check_spine.setToolTip(
+            "并行读取书脊中各正文文件的首个标题，与目录交叉核对"
+        )
+        self.chk_check_spine.setChecked(self.config.get("check_spine", False))
+        row1.addWidget(self.chk_check_spine)
+        self.chk_title_dupes = QCheckBox("检查重复标题")
+        self.chk_title_dupes.setToolTip(
+            "列出标题相同但章节号不同的章节，可能是同一章上传了两次"
+        )
+        self.chk_title_dupes.setChecked(self.config.get("check_title_dupes", False))
+        row1.addWidget(self.chk_title_dupes)
+        self.chk_show_perf = QCheckBox("显示性能统计")
+        self.chk_show_perf.setChecked(self.config.get("show_perf", False))
+        row1.addWidget(self.chk_show_perf)
         chap_layout.addLayout(row1)
 
         row2 = QHBoxLayout()
@@ -65,6 +135,10 @@ class MainDialog(QDialog):
         self.btn_add_suffix = QPushButton("添加后缀")
         self.btn_add_suffix.clicked.connect(self.add_custom_suffix)
         row2.addWidget(self.btn_add_suffix)
+        self.chk_multi_suffix = QCheckBox("多后缀分别检测")
+        self.chk_multi_suffix.setToolTip("一次扫描，按后缀列表中的每个后缀分别输出序列分析")
+        self.chk_multi_suffix.setChecked(self.config.get("multi_suffix", False))
+        row2.addWidget(self.chk_multi_suffix)
         row2.addStretch()
 
         row2.addWidget(QLabel("编号模式:"))
@@ -105,6 +179,17 @@ class MainDialog(QDialog):
         self.chk_auto_reset.setChecked(self.config.get("auto_detect_reset", False))
         vol_row2.addWidget(self.chk_auto_reset)
         vol_row2.addStretch()
+        vol_row2.addWidget(QLabel("异常跳跃阈值:"))
+        self.spin_max_gap = QSpinBox()
+        self.spin_max_gap.setRange(0, 1000000)
+        self.spin_max_gap.setSingleStep(100)
+        self.spin_max_gap.setSuffix(" 章")
+        self.spin_max_gap.setSpecialValueText("不启用")
+        self.spin_max_gap.setToolTip(
+            "连续缺失超过此章数时视为章节号识别错误，列为异常跳跃，不插入占位符"
+        )
+        self.spin_max_gap.setValue(self.config.get("max_gap", DEFAULT_MAX_GAP) or 0)
+        vol_row2.addWidget(self.spin_max_gap)
         vol_main.addLayout(vol_row2)
 
         grp_vol.setLayout(vol_main)
@@ -126,7 +211,7 @@ class MainDialog(QDialog):
         self.btn_insert = QPushButton("插入缺失占位")
         self.btn_insert.setMinimumHeight(36)
         self.btn_insert.setToolTip(
-            f"在 nav 目录中插入缺失章节占位符\n标记: {MISSING_MARKER}"
+            f"在目录 (nav/ncx) 中插入缺失章节占位符\n标记: {MISSING_MARKER}"
         )
         self.btn_insert.clicked.connect(self.do_insert_missing)
         self.btn_remove = QPushButton("删除占位符")
@@ -138,21 +223,61 @@ class MainDialog(QDialog):
         btn_layout.addWidget(self.btn_remove)
         btn_layout.addStretch()
 
+        self.btn_cancel = QPushButton("取消")
+        self.btn_cancel.setMinimumHeight(36)
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_task)
+        btn_layout.addWidget(self.btn_cancel)
+
         self.btn_close = QPushButton("关闭")
         self.btn_close.setMinimumHeight(36)
         self.btn_close.clicked.connect(self.reject)
         btn_layout.addWidget(self.btn_close)
         layout.addLayout(btn_layout)
 
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setMaximumHeight(12)
+        self.progress_bar.setVisible(False)
+        progress_layout.addWidget(self.progress_bar, 1)
+        self.lbl_progress = QLabel("")
+        progress_layout.addWidget(self.lbl_progress)
+        layout.addLayout(progress_layout)
+
         grp_result = QGroupBox("检查结果")
         result_layout = QVBoxLayout()
-        self.text_result = QTextEdit()
-        self.text_result.setReadOnly(True)
         font = QFont()
         font.setPointSize(12)
+        self.tabs_result = QTabWidget()
+
+        tree_page = QWidget()
+        tree_layout = QVBoxLayout()
+        tree_layout.setContentsMargins(0, 0, 0, 0)
+        self.inp_filter = QLineEdit()
+        self.inp_filter.setPlaceholderText("筛选（如: 第 3 卷、倒退、1200）")
+        self.inp_filter.textChanged.connect(self.on_filter_changed)
+        tree_layout.addWidget(self.inp_filter)
+        self.result_model = ResultTreeModel(self)
+        self.tree_result = QTreeView()
+        self.tree_result.setFont(font)
+        self.tree_result.setUniformRowHeights(True)
+        self.tree_result.setModel(self.result_model)
+        tree_layout.addWidget(self.tree_result)
+        tree_page.setLayout(tree_layout)
+        self.tabs_result.addTab(tree_page, "结构视图")
+
+        self.text_result = QTextEdit()
+        self.text_result.setReadOnly(True)
         self.text_result.setFont(font)
         self.text_result.setPlaceholderText("点击「开始检查」查看结果...")
-        result_layout.addWidget(self.text_result)
+        self.tabs_result.addTab(self.text_result, "文本报告")
+        self.tabs_result.setCurrentWidget(self.text_result)
+        self.tabs_result.currentChanged.connect(self.on_result_tab_changed)
+        self.pending_result = None
+        self.last_result = None
+
+        result_layout.addWidget(self.tabs_result)
         grp_result.setLayout(result_layout)
         layout.addWidget(grp_result, 1)
 
@@ -162,44 +287,242 @@ class MainDialog(QDialog):
         current = self.combo_suffix.currentText().strip()
         if current and self.combo_suffix.findText(current) < 0:
             self.combo_suffix.addItem(current)
-            self.text_result.setPlainText(f"✅ 已添加后缀「{current}」")
+            self.show_message(f"✅ 已添加后缀「{current}」")
 
     def get_config(self):
         suffixes = [self.combo_suffix.itemText(i) for i in range(self.combo_suffix.count())]
-        return {
-            "chap_prefix": self.inp_prefix.text(),
-            "chap_num_type": self.combo_num_type.currentData(),
-            "chap_suffix": self.combo_suffix.currentText(),
-            "custom_suffixes": suffixes,
-            "enable_volume": self.chk_enable_vol.isChecked(),
-            "vol_regex": self.inp_vol_regex.text(),
-            "chap_reset_mode": self.combo_mode.currentData(),
-            "auto_detect_reset": self.chk_auto_reset.isChecked(),
-        }
+        config = dict(self.config)
+        config.update(
+            chap_prefix=self.inp_prefix.text(),
+            chap_num_type=self.combo_num_type.currentData(),
+            chap_suffix=self.combo_suffix.currentText(),
+            custom_suffixes=suffixes,
+            enable_volume=self.chk_enable_vol.isChecked(),
+            vol_regex=self.inp_vol_regex.text(),
+            chap_reset_mode=self.combo_mode.currentData(),
+            auto_detect_reset=self.chk_auto_reset.isChecked(),
+            multi_suffix=self.chk_multi_suffix.isChecked(),
+            check_spine=self.chk_check_spine.isChecked(),
+            check_title_dupes=self.chk_title_dupes.isChecked(),
+            max_gap=self.spin_max_gap.value(),
+            show_perf=self.chk_show_perf.isChecked(),
+        )
+        return config
 
     def do_save(self):
         new_config = self.get_config()
         save_config(new_config)
         self.config = new_config
-        self.text_result.setPlainText("✅ 设置已保存")
+        self.show_message("✅ 设置已保存")
+
+    def start_task(self, task, on_done, busy_text, cancellable=False):
+        self.set_busy(True, cancellable)
+        self.lbl_progress.setText(busy_text)
+        self.streamed = False
+
+        self.worker = TaskWorker(task, self)
+        self.worker.progress.connect(self.on_task_progress)
+        self.worker.partial.connect(self.on_task_partial)
+        self.worker.succeeded.connect(on_done)
+        self.worker.failed.connect(self.on_task_failed)
+        self.worker.cancelled.connect(self.on_task_cancelled)
+        self.worker.finished.connect(self.on_task_finished)
+        self.worker.start()
+
+    def set_busy(self, busy, cancellable=False):
+        for btn in (
+            self.btn_check,
+            self.btn_save,
+            self.btn_infer,
+            self.btn_insert,
+            self.btn_remove,
+        ):
+            btn.setEnabled(not busy)
+        self.btn_cancel.setEnabled(busy and cancellable)
+        self.progress_bar.setVisible(busy)
+        self.progress_bar.setRange(0, 0)
+
+    def cancel_task(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.btn_cancel.setEnabled(False)
+            self.lbl_progress.setText("正在取消...")
+
+    def on_task_progress(self, scanned, total, parsed):
+        if total:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(scanned)
+            self.lbl_progress.setText(f"已扫描 {scanned}/{total} 条目，识别 {parsed} 章")
+        else:
+            self.lbl_progress.setText(f"已扫描 {scanned} 条目，识别 {parsed} 章")
+
+    def on_task_partial(self, lines):
+        if not self.streamed:
+            self.text_result.clear()
+            self.streamed = True
+        self.text_result.append("\n".join(lines))
+
+    def on_task_failed(self, message):
+        self.show_message(f"❌ 执行出错: {message}")
+
+    def on_task_cancelled(self):
+        self.text_result.append("\n⏹️ 检查已取消")
+
+    def on_task_finished(self):
+        self.worker = None
+        self.set_busy(False)
+        self.lbl_progress.setText("")
+
+    def reject(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().reject()
 
     def do_check(self):
         new_config = self.get_config()
         save_config(new_config)
         self.config = new_config
-        result_text, missing = perform_check(self.bk, new_config)
-        self.last_missing = missing
-        self.text_result.setPlainText(result_text)
+        self.pending_result = None
+        self.text_result.clear()
+        self.tabs_result.setCurrentWidget(self.text_result)
+        self.result_model.set_result(None)
+
+        def task(worker):
+            perf = PerfRecorder() if new_config.get("show_perf", False) else None
+            try:
+                doc = self.toc_doc or load_toc(self.bk, perf)
+            except Exception:
+                # load_toc may fail after its first stage started tracemalloc
+                if perf:
+                    perf.finish()
+                raise
+            # Spine files are not part of the cache key, so spine checks always rerun
+            use_cache = (
+                doc
+                and not new_config.get("show_perf", False)
+                and not new_config.get("check_spine", False)
+            )
+            cache_key = make_cache_key(doc, new_config) if use_cache else None
+            cached = self.result_cache.get(cache_key) if cache_key else None
+            if cached:
+                return doc, cached, True
+
+            check_result = perform_check(
+                self.bk,
+                new_config,
+                doc,
+                progress=worker.report_progress,
+                emit=worker.emit_lines,
+                perf=perf,
+                keep_state=True,
+            )
+            # Errors such as a volume regex timeout depend on the moment, so
+            # they are not replayed from the cache
+            if cache_key and not check_result.error:
+                self.result_cache.put(cache_key, check_result)
+            return doc, check_result, False
+
+        self.start_task(task, self.on_check_done, "正在检查...", cancellable=True)
+
+    def on_check_done(self, result):
+        doc, check_result, from_cache = result
+        self.toc_doc = doc
+        self.last_result = check_result
+        self.last_missing = check_result.missing
+        self.result_model.set_result(check_result)
+        if not self.streamed:
+            self.pending_result = (check_result, from_cache)
+        if check_result.sequences:
+            self.tabs_result.setCurrentIndex(0)
+        else:
+            self.show_pending_text()
+
+    def show_pending_text(self):
+        # The full text can be huge; it is only rendered once the tab is opened
+        if self.pending_result is None:
+            return
+        check_result, from_cache = self.pending_result
+        self.pending_result = None
+        text = render_text(check_result)
+        if from_cache:
+            text += "\n\n♻️ 目录未变化，结果来自缓存"
+        self.tabs_result.setCurrentWidget(self.text_result)
+        self.text_result.setPlainText(text)
+
+    def show_message(self, text):
+        self.pending_result = None
+        self.tabs_result.setCurrentWidget(self.text_result)
+        self.text_result.setPlainText(text)
+
+    def on_result_tab_changed(self, index):
+        if self.tabs_result.widget(index) is self.text_result:
+            self.show_pending_text()
+
+    def on_filter_changed(self, text):
+        self.result_model.set_filter(text)
+
+    def do_infer(self):
+        config = self.get_config()
+
+        def task(worker):
+            doc = self.toc_doc or load_toc(self.bk)
+            if not doc:
+                return doc, None, "无法找到或解析目录文件 (nav.xhtml/toc.ncx)"
+            guess, err = infer_config(doc.texts, config)
+            return doc, guess, err
+
+        self.start_task(task, self.on_infer_done, "正在识别章节格式...")
+
+    def on_infer_done(self, result):
+        doc, guess, err = result
+        self.toc_doc = doc
+        if err:
+            self.show_message(f"⚠️ {err}")
+            return
+
+        inferred = guess["config"]
+        self.inp_prefix.setText(inferred["chap_prefix"])
+        idx = self.combo_suffix.findText(inferred["chap_suffix"])
+        if idx >= 0:
+            self.combo_suffix.setCurrentIndex(idx)
+        else:
+            self.combo_suffix.setCurrentText(inferred["chap_suffix"])
+        for combo, key in (
+            (self.combo_num_type, "chap_num_type"),
+            (self.combo_mode, "chap_reset_mode"),
+        ):
+            for i in range(combo.count()):
+                if combo.itemData(i) == inferred[key]:
+                    combo.setCurrentIndex(i)
+                    break
+        self.chk_enable_vol.setChecked(inferred["enable_volume"])
+        self.inp_vol_regex.setText(inferred["vol_regex"])
+        self.chk_auto_reset.setChecked(inferred["auto_detect_reset"])
+
+        lines = [
+            "🔎 自动识别结果（已填入设置，确认后点击「开始检查」）",
+            f"   前缀: 「{inferred['chap_prefix']}」",
+            f"   后缀: 「{inferred['chap_suffix']}」",
+            f"   数字类型: {self.combo_num_type.currentText()}",
+            f"   编号模式: {self.combo_mode.currentText()}",
+            f"   分卷: {'是' if inferred['enable_volume'] else '否'}",
+            f"   自动分段: {'是' if inferred['auto_detect_reset'] else '否'}",
+            f"   抽样匹配: {guess['matched']}/{guess['sampled']} "
+            f"(目录共 {guess['total']} 条)",
+        ]
+        self.show_message("\n".join(lines))
 
     def do_insert_missing(self):
         if not hasattr(self, "last_missing") or not self.last_missing:
-            self.text_result.setPlainText("⚠️ 请先点击「开始检查」获取缺失章节列表")
+            self.show_message("⚠️ 请先点击「开始检查」获取缺失章节列表")
             return
 
         reply = QMessageBox.question(
             self,
             "确认插入",
-            f"将在 nav 目录中插入 {len(self.last_missing)} 个缺失章节占位符。\n\n"
+            f"将在目录 (nav/ncx) 中插入 "
+            f"{count_intervals(self.last_missing)} 个缺失章节占位符。\n\n"
             f"标记格式: {MISSING_MARKER}第X章\n"
             f"占位符将指向最近的现有章节。\n\n"
             f"确定继续?",
@@ -209,34 +532,76 @@ class MainDialog(QDialog):
 
         if reply == QMessageBox.Yes:
             config = self.get_config()
-            count, err = insert_missing_chapters_to_nav(self.bk, config, self.last_missing)
-            if err:
-                self.text_result.setPlainText(f"❌ 插入失败: {err}")
-            else:
-                self.text_result.setPlainText(
-                    f"✅ 已插入 {count} 个缺失章节占位符\n\n"
-                    f"标记: {MISSING_MARKER}\n"
-                    f"类名: {MISSING_CLASS}\n\n"
-                    f"可随时使用「删除占位符」按钮移除"
-                )
+            missing = self.last_missing
+            doc = self.toc_doc
+
+            def task(worker):
+                return insert_missing_chapters_to_nav(self.bk, config, missing, doc)
+
+            self.start_task(task, self.on_insert_done, "正在插入占位符...")
+
+    def apply_toc_edit(self, edit):
+        # Updates the last result from the edit delta instead of re-reading the TOC
+        state = getattr(self.last_result, "state", None)
+        new_result = state.apply(edit) if state else None
+        self.last_result = new_result
+        if new_result is None:
+            self.last_missing = []
+            self.result_model.set_result(None)
+            return "ℹ️ 目录已修改，请重新点击「开始检查」查看最新结果"
+        self.last_missing = new_result.missing
+        self.result_model.set_result(new_result)
+        return (
+            f"♻️ 检查结果已按本次修改增量更新（见「结构视图」），"
+            f"当前缺失 {new_result.missing_count} 章"
+        )
+
+    def on_insert_done(self, result):
+        count, err, edit = result
+        recheck = ""
+        if count:
+            self.toc_doc = None
+            recheck = "\n\n" + self.apply_toc_edit(edit)
+        if err:
+            self.show_message(f"❌ 插入失败: {err}")
+        else:
+            self.show_message(
+                f"✅ 已插入 {count} 个缺失章节占位符\n\n"
+                f"标记: {MISSING_MARKER}\n"
+                f"类名: {MISSING_CLASS}\n\n"
+                f"可随时使用「删除占位符」按钮移除" + recheck
+            )
 
     def do_remove_placeholders(self):
         reply = QMessageBox.question(
             self,
             "确认删除",
-            f"将删除 nav 目录中所有带 {MISSING_MARKER} 标记的占位符。\n\n确定继续?",
+            f"将删除目录 (nav/ncx) 中所有带 {MISSING_MARKER} 标记的占位符。\n\n确定继续?",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No,
         )
 
         if reply == QMessageBox.Yes:
-            count, err = remove_missing_placeholders(self.bk)
-            if err:
-                self.text_result.setPlainText(f"❌ 删除失败: {err}")
-            elif count == 0:
-                self.text_result.setPlainText("ℹ️ 未找到需要删除的占位符")
-            else:
-                self.text_result.setPlainText(f"✅ 已删除 {count} 个占位符")
+            config = self.get_config()
+            doc = self.toc_doc
+
+            def task(worker):
+                return remove_missing_placeholders(self.bk, doc, config)
+
+            self.start_task(task, self.on_remove_done, "正在删除占位符...")
+
+    def on_remove_done(self, result):
+        count, err, edit = result
+        recheck = ""
+        if count:
+            self.toc_doc = None
+            recheck = "\n\n" + self.apply_toc_edit(edit)
+        if err:
+            self.show_message(f"❌ 删除失败: {err}")
+        elif count == 0:
+            self.show_message("ℹ️ 未找到需要删除的占位符")
+        else:
+            self.show_message(f"✅ 已删除 {count} 个占位符" + recheck)
 
 
 def run(bk):
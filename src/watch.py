@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from collections import deque
+
+STATS_WINDOW = 60.0
+
+
+class FolderPoller:
+    # Finds EPUBs that are new or changed since they were last handed out.
+    # A file is only handed out once its size and mtime stayed the same for
+    # one whole poll, so books still being copied into the folder are skipped.
+    def __init__(self, paths, find, stat, known=None, settle=True):
+        self.paths = paths
+        self.find = find
+        self.stat = stat
+        self.settle = settle
+        self.done = dict(known or {})
+        self.last_seen = {}
+
+    def poll(self, busy=()):
+        seen = {}
+        ready = []
+        for path in self.find(self.paths):
+            key = os.path.abspath(path)
+            try:
+                stat = self.stat(path)
+            except OSError:
+                continue
+            seen[key] = stat
+            if key in busy or self.done.get(key) == stat:
+                continue
+            if self.settle and self.last_seen.get(key) != stat:
+                continue
+            self.done[key] = stat
+            ready.append((path, stat))
+
+        for key in set(self.done) - set(seen):
+            del self.done[key]
+        self.last_seen = seen
+        return ready, len(seen)
+
+
+class WatchStats:
+    def __init__(self):
+        self.started = time.time()
+        self.submitted = 0
+        self.counts = {"OK": 0, "MISSING": 0, "ERROR": 0}
+        self.files = 0
+        self.scans = 0
+        self.scan_ms = 0.0
+        self.recent = deque()
+
+    def scanned(self, files, elapsed):
+        self.scans += 1
+        self.files = files
+        self.scan_ms = elapsed * 1000
+
+    def completed(self, status):
+        self.counts[status] += 1
+        self.recent.append(time.time())
+
+    def to_dict(self, queue_depth):
+        now = time.time()
+        while self.recent and now - self.recent[0] > STATS_WINDOW:
+            self.recent.popleft()
+        uptime = now - self.started
+        completed = sum(self.counts.values())
+        return {
+            "uptime": round(uptime, 1),
+            "files": self.files,
+            "scans": self.scans,
+            "last_scan_ms": round(self.scan_ms, 1),
+            "submitted": self.submitted,
+            "completed": completed,
+            "queue_depth": queue_depth,
+            "ok": self.counts["OK"],
+            "missing": self.counts["MISSING"],
+            "error": self.counts["ERROR"],
+            "books_per_sec": round(completed / uptime, 2) if uptime else 0.0,
+            "books_per_sec_recent": round(
+                len(self.recent) / min(uptime, STATS_WINDOW), 2
+            )
+            if uptime
+            else 0.0,
+        }
+
+    def write(self, path, queue_depth):
+        # Replaced atomically so monitoring never reads a half-written file
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(queue_depth), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def format_line(self, queue_depth):
+        data = self.to_dict(queue_depth)
+        return (
+            f"已检查 {data['completed']} 本 (完整 {data['ok']}, 缺失 {data['missing']}, "
+            f"出错 {data['error']})，队列 {queue_depth}，"
+            f"{data['books_per_sec_recent']} 本/秒"
+        )